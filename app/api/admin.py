@@ -3,15 +3,30 @@
 FastAPI 기반 관리 대시보드
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from loguru import logger
-from typing import Dict, Any
+from typing import Dict, Optional, Any
+import asyncio
 import secrets
 import os
 
 from app.core.config import settings
+from app.core.profiling import sampling_profiler
+from app.core.loop_monitor import loop_monitor
+from app.core.logging import read_log_tail, truncate_log_file, log_file_version
+from app.core.http_cache import not_modified
 from app.services.openai_service import openai_service
+from app.services.usage_ledger import usage_ledger
+from app.services.model_router import model_router
+from app.services.shadow_eval import shadow_evaluator
+from app.services.dedupe import delivery_deduper
+from app.services.similarity_cache import similarity_cache, LSH_BANDS
+from app.services.prompt_compactor import prompt_compactor
+from app.services.traffic_capture import traffic_capture
+from app.services.traffic_sketch import traffic_sketch, message_key
+from app.services.mqtt_dispatch import mqtt_dispatcher
+from app.services.warm_start import warm_start
 
 router = APIRouter()
 security = HTTPBasic()
@@ -40,10 +55,13 @@ async def get_config(admin: str = Depends(verify_admin_credentials)):
         },
         "openai": {
             "api_key_set": bool(settings.OPENAI_API_KEY),
+            "api_key_count": len(openai_service.key_pool.keys),
             "model": settings.OPENAI_MODEL,
             "max_tokens": settings.OPENAI_MAX_TOKENS,
             "temperature": settings.OPENAI_TEMPERATURE,
-            "available": openai_service.is_available()
+            "available": openai_service.is_available(),
+            "routing_enabled": settings.OPENAI_ROUTING_ENABLED,
+            "routing_models": model_router.candidates()
         },
         "messenger_bot": {
             "webhook_secret_set": bool(settings.MESSENGER_BOT_WEBHOOK_SECRET),
@@ -63,11 +81,27 @@ async def update_openai_config(
     admin: str = Depends(verify_admin_credentials)
 ):
     """OpenAI 설정 업데이트"""
+    routing_models = config.get("routing_models")
+    if "routing_models" in config and not (
+        isinstance(routing_models, list)
+        and all(isinstance(model, str) and model.strip() for model in routing_models)
+    ):
+        raise HTTPException(status_code=400, detail="routing_models는 비어 있지 않은 모델 이름 문자열의 목록이어야 합니다.")
+    api_keys = config.get("api_keys")
+    if "api_keys" in config and not (
+        isinstance(api_keys, list)
+        and all(isinstance(key, str) and key.strip() for key in api_keys)
+    ):
+        raise HTTPException(status_code=400, detail="api_keys는 비어 있지 않은 API 키 문자열의 목록이어야 합니다.")
+    
     try:
         # 설정 업데이트
-        if "api_key" in config:
-            settings.OPENAI_API_KEY = config["api_key"]
-            # 새 API 키로 서비스 재초기화
+        if "api_key" in config or "api_keys" in config:
+            if "api_key" in config:
+                settings.OPENAI_API_KEY = config["api_key"]
+            if "api_keys" in config:
+                settings.OPENAI_API_KEYS = [key.strip() for key in api_keys]
+            # 새 API 키로 서비스 재초기화 (키 풀 재구성)
             openai_service._initialize_client()
         
         if "model" in config:
@@ -79,6 +113,12 @@ async def update_openai_config(
         if "temperature" in config:
             settings.OPENAI_TEMPERATURE = float(config["temperature"])
         
+        if "routing_enabled" in config:
+            settings.OPENAI_ROUTING_ENABLED = bool(config["routing_enabled"])
+        
+        if "routing_models" in config:
+            settings.OPENAI_ROUTING_MODELS = [model.strip() for model in routing_models]
+        
         logger.info(f"관리자 {admin}이 OpenAI 설정을 업데이트했습니다.")
         
         return {
@@ -101,17 +141,14 @@ async def test_openai_connection(admin: str = Depends(verify_admin_credentials))
     else:
         raise HTTPException(status_code=500, detail=result["message"])
 
-@router.get("/stats")
-async def get_stats(admin: str = Depends(verify_admin_credentials)):
-    """서버 통계 조회"""
+def _collect_system_stats() -> Dict[str, Any]:
+    """시스템 자원 사용량 (CPU 측정에 1초가 걸리므로 asyncio.to_thread로 호출)"""
     import psutil
-    import datetime
+    import platform
     
-    # 시스템 정보
     cpu_percent = psutil.cpu_percent(interval=1)
     memory = psutil.virtual_memory()
     # Windows에서는 C: 드라이브 사용
-    import platform
     if platform.system() == 'Windows':
         disk = psutil.disk_usage('C:\\')
     else:
@@ -122,6 +159,25 @@ async def get_stats(admin: str = Depends(verify_admin_credentials)):
     if os.path.exists(settings.LOG_FILE):
         log_size = os.path.getsize(settings.LOG_FILE)
     
+    return {
+        "cpu_percent": cpu_percent,
+        "memory": memory,
+        "disk": disk,
+        "log_size": log_size
+    }
+
+@router.get("/stats")
+async def get_stats(admin: str = Depends(verify_admin_credentials)):
+    """서버 통계 조회"""
+    import datetime
+    
+    # 시스템 정보
+    system = await asyncio.to_thread(_collect_system_stats)
+    cpu_percent = system["cpu_percent"]
+    memory = system["memory"]
+    disk = system["disk"]
+    log_size = system["log_size"]
+    
     return {
         "system": {
             "cpu_usage": f"{cpu_percent}%",
@@ -133,6 +189,11 @@ async def get_stats(admin: str = Depends(verify_admin_credentials)):
         "service": {
             "openai_available": openai_service.is_available(),
             "openai_model": settings.OPENAI_MODEL,
+            "circuit_breaker": openai_service.breaker.snapshot(),
+            "retry_budget": openai_service.retry_budget.snapshot(),
+            "dedupe": delivery_deduper.snapshot(),
+            "event_loop": loop_monitor.snapshot(event_limit=0),
+            "traffic": traffic_sketch.summary(300),
             "log_file_size": f"{log_size / 1024:.1f} KB" if log_size else "0 KB",
             "uptime": "서버 실행 중"
         },
@@ -144,22 +205,295 @@ async def get_stats(admin: str = Depends(verify_admin_credentials)):
         "timestamp": datetime.datetime.now().isoformat()
     }
 
+@router.get("/keys")
+async def get_key_pool(admin: str = Depends(verify_admin_credentials)):
+    """API 키별 사용률 (남은 요청/토큰 한도, 초기화까지 남은 시간, 429 횟수, 쿨다운)"""
+    return openai_service.key_pool.snapshot()
+
+@router.get("/routing")
+async def get_routing(
+    decisions: int = 20,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """모델 라우팅 상태 및 최근 결정 조회"""
+    return model_router.snapshot(decision_limit=decisions)
+
+@router.get("/shadow")
+async def get_shadow_report(
+    recent: int = 5,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """섀도 평가 결과 (현재 모델/프롬프트와 후보의 지연 시간, 토큰, 출력 길이, 오류 비교)"""
+    return shadow_evaluator.snapshot(recent_limit=recent)
+
+@router.post("/shadow/config")
+async def update_shadow_config(
+    config: Dict[str, Any],
+    admin: str = Depends(verify_admin_credentials)
+):
+    """섀도 평가 설정 변경 (enabled, sample_rate, model, system_prompt / 후보가 바뀌면 통계 초기화)"""
+    sample_rate = config.get("sample_rate")
+    if sample_rate is not None and (
+        isinstance(sample_rate, bool)
+        or not isinstance(sample_rate, (int, float))
+        or not 0.0 <= sample_rate <= 1.0
+    ):
+        raise HTTPException(status_code=400, detail="sample_rate는 0~1 사이의 숫자여야 합니다.")
+    shadow_evaluator.configure(
+        enabled=config.get("enabled"),
+        sample_rate=sample_rate,
+        model=config.get("model"),
+        system_prompt=config.get("system_prompt")
+    )
+    logger.info(f"관리자 {admin}이 섀도 평가 설정을 변경했습니다: 후보 {shadow_evaluator.candidate_label}, 비율 {shadow_evaluator.sample_rate}")
+    return shadow_evaluator.snapshot(recent_limit=0)
+
+@router.post("/shadow/reset")
+async def reset_shadow_report(admin: str = Depends(verify_admin_credentials)):
+    """섀도 평가 통계 초기화"""
+    shadow_evaluator.reset()
+    return {"status": "success", "message": "섀도 평가 통계가 초기화되었습니다."}
+
+@router.get("/compaction")
+async def get_compaction_stats(
+    recent: int = 20,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """프롬프트 압축 통계 (요청별 절약 토큰 포함)"""
+    return prompt_compactor.snapshot(recent_limit=recent)
+
+@router.get("/similarity")
+async def get_similarity_stats(admin: str = Depends(verify_admin_credentials)):
+    """유사 메시지 요약 캐시 통계 (적중률, 정밀도 추정)"""
+    return similarity_cache.snapshot()
+
+@router.post("/similarity/config")
+async def update_similarity_config(
+    config: Dict[str, Any],
+    admin: str = Depends(verify_admin_credentials)
+):
+    """유사 메시지 캐시 설정 업데이트"""
+    try:
+        if "enabled" in config:
+            settings.SIMILARITY_CACHE_ENABLED = bool(config["enabled"])
+        
+        if "max_distance" in config:
+            max_distance = int(config["max_distance"])
+            if not 0 <= max_distance < LSH_BANDS:
+                raise ValueError(f"max_distance는 0 ~ {LSH_BANDS - 1} 사이여야 합니다.")
+            settings.SIMILARITY_MAX_DISTANCE = max_distance
+        
+        if "min_chars" in config:
+            settings.SIMILARITY_MIN_CHARS = int(config["min_chars"])
+        
+        if "verify_rate" in config:
+            verify_rate = float(config["verify_rate"])
+            if not 0.0 <= verify_rate <= 1.0:
+                raise ValueError("verify_rate는 0 ~ 1 사이여야 합니다.")
+            settings.SIMILARITY_VERIFY_RATE = verify_rate
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    logger.info(f"관리자 {admin}이 유사 메시지 캐시 설정을 업데이트했습니다.")
+    return {"status": "success", "similarity": similarity_cache.snapshot()}
+
+@router.post("/similarity/clear")
+async def clear_similarity_cache(admin: str = Depends(verify_admin_credentials)):
+    """유사 메시지 캐시 비우기"""
+    similarity_cache.clear()
+    return {"status": "success", "message": "유사 메시지 캐시를 비웠습니다."}
+
+@router.get("/usage")
+async def get_usage(
+    buckets: int = 24,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """OpenAI 사용량 요약 (전체/모델별/시간 구간별)"""
+    return usage_ledger.snapshot(bucket_limit=buckets)
+
+@router.get("/usage/top")
+async def get_top_usage(
+    n: int = 10,
+    by: str = "total_tokens",
+    admin: str = Depends(verify_admin_credentials)
+):
+    """사용량 상위 채팅방 조회"""
+    if not 1 <= n <= settings.USAGE_MAX_ROOMS:
+        raise HTTPException(status_code=400, detail=f"n은 1 이상 {settings.USAGE_MAX_ROOMS} 이하여야 합니다.")
+    try:
+        return {"by": by, "rooms": usage_ledger.top_rooms(n=n, by=by)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/usage/rooms/{room:path}")
+async def get_room_usage(room: str, admin: str = Depends(verify_admin_credentials)):
+    """특정 채팅방 사용량 조회"""
+    usage = usage_ledger.room_usage(room)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="해당 채팅방의 사용 기록이 없습니다.")
+    return usage
+
+@router.post("/usage/flush")
+async def flush_usage(admin: str = Depends(verify_admin_credentials)):
+    """사용량 원장을 즉시 파일로 기록"""
+    written = await usage_ledger.flush(force=True)
+    return {
+        "status": "success" if written else "error",
+        "file": settings.USAGE_LEDGER_FILE
+    }
+
+@router.get("/profiler")
+async def get_profiler_status(admin: str = Depends(verify_admin_credentials)):
+    """샘플링 프로파일러 상태 및 마지막 결과"""
+    return sampling_profiler.status()
+
+@router.post("/profiler/start")
+async def start_profiler(
+    config: Dict[str, Any],
+    admin: str = Depends(verify_admin_credentials)
+):
+    """샘플링 프로파일러 시작 (N개 요청 또는 지정 시간 동안)"""
+    try:
+        status_info = sampling_profiler.start(
+            duration_seconds=float(config.get("duration_seconds", 30)),
+            max_requests=int(config["max_requests"]) if config.get("max_requests") else None,
+            interval_ms=float(config.get("interval_ms", 10))
+        )
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    logger.info(f"관리자 {admin}이 샘플링 프로파일러를 시작했습니다.")
+    return status_info
+
+@router.post("/profiler/stop")
+async def stop_profiler(admin: str = Depends(verify_admin_credentials)):
+    """샘플링 프로파일러 중지 후 결과 반환"""
+    result = await asyncio.to_thread(sampling_profiler.stop)
+    return {"status": "success", "result": result}
+
+@router.get("/loop")
+async def get_loop_health(
+    events: int = 10,
+    stacks: bool = True,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """이벤트 루프 지연 백분위(ms)와 루프를 차단한 콜백의 위치/스택"""
+    return loop_monitor.snapshot(event_limit=events, with_stacks=stacks)
+
+@router.post("/loop/reset")
+async def reset_loop_health(admin: str = Depends(verify_admin_credentials)):
+    """이벤트 루프 측정값 초기화 (수정 전후 비교용)"""
+    loop_monitor.reset()
+    logger.info(f"관리자 {admin}이 이벤트 루프 측정값을 초기화했습니다.")
+    return loop_monitor.snapshot(event_limit=0)
+
+@router.get("/traffic")
+async def get_traffic(
+    window: int = 300,
+    top: int = 10,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """최근 window초 트래픽 구성 (고유 채팅방/발신자 수, 상위 채팅방/발신자, 반복 메시지)"""
+    return traffic_sketch.snapshot(seconds=window, limit=top)
+
+@router.get("/traffic/estimate")
+async def estimate_traffic(
+    room: str,
+    sender: Optional[str] = None,
+    message: Optional[str] = None,
+    window: int = 300,
+    admin: str = Depends(verify_admin_credentials)
+):
+    """특정 채팅방/발신자/메시지의 최근 window초 빈도 상한 추정 (제한값 조정용)"""
+    window = max(settings.SKETCH_SLOT_SECONDS, min(window, traffic_sketch.max_window))
+    result = {
+        "window_seconds": window,
+        "room": room,
+        "room_messages": traffic_sketch.estimate("rooms", room, window)
+    }
+    if sender is not None:
+        result["sender"] = sender
+        result["sender_messages"] = traffic_sketch.estimate("senders", f"{room}\x00{sender}", window)
+    if message is not None:
+        result["message_repeats"] = traffic_sketch.estimate("messages", message_key(message), window)
+    return result
+
+@router.post("/traffic/reset")
+async def reset_traffic(admin: str = Depends(verify_admin_credentials)):
+    """트래픽 스케치 초기화"""
+    traffic_sketch.reset()
+    logger.info(f"관리자 {admin}이 트래픽 스케치를 초기화했습니다.")
+    return {"status": "success"}
+
+@router.get("/capture")
+async def get_capture_status(admin: str = Depends(verify_admin_credentials)):
+    """트래픽 수집 상태"""
+    return traffic_capture.status()
+
+@router.post("/capture/start")
+async def start_capture(
+    config: Dict[str, Any],
+    admin: str = Depends(verify_admin_credentials)
+):
+    """웹훅 트래픽 수집 시작 (기본적으로 방/발신자/내용 가명 처리)"""
+    traffic_capture.start(anonymize=config.get("anonymize"))
+    logger.info(f"관리자 {admin}이 트래픽 수집을 시작했습니다.")
+    return traffic_capture.status()
+
+@router.post("/capture/stop")
+async def stop_capture(admin: str = Depends(verify_admin_credentials)):
+    """웹훅 트래픽 수집 중지"""
+    await traffic_capture.stop()
+    logger.info(f"관리자 {admin}이 트래픽 수집을 중지했습니다.")
+    return traffic_capture.status()
+
+@router.get("/mqtt")
+async def get_mqtt_status(admin: str = Depends(verify_admin_credentials)):
+    """MQTT 작업 분산 상태 (발행/완료/시간 초과 수, 내장 워커 상태)"""
+    return mqtt_dispatcher.snapshot()
+
+@router.get("/warm-start")
+async def get_warm_start_status(admin: str = Depends(verify_admin_credentials)):
+    """웜 스타트 스냅샷 복원/저장 상태"""
+    return warm_start.status()
+
+@router.post("/warm-start/save")
+async def save_warm_start(admin: str = Depends(verify_admin_credentials)):
+    """현재 상태를 스냅샷으로 저장 (비정상 종료 대비)"""
+    result = await warm_start.save()
+    logger.info(f"관리자 {admin}이 웜 스타트 스냅샷을 저장했습니다.")
+    return result
+
 @router.get("/logs")
 async def get_logs(
+    request: Request,
+    response: Response,
     limit: int = 100,
     admin: str = Depends(verify_admin_credentials)
 ):
-    """로그 조회"""
+    """로그 조회 (로그 파일이 그대로면 If-None-Match에 304로 응답)"""
     try:
-        if not os.path.exists(settings.LOG_FILE):
+        version = await asyncio.to_thread(log_file_version, settings.LOG_FILE)
+        if version is None:
             return {"logs": [], "message": "로그 파일이 존재하지 않습니다."}
         
-        with open(settings.LOG_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            recent_lines = lines[-limit:] if len(lines) > limit else lines
+        # 압축 여부와 관계없이 같은 내용이므로 약한 ETag (gzip/원본 응답이 같은 검증자를 공유)
+        etag = f'W/"{version}-{limit}"'
+        cached = not_modified(request, etag, settings.HTTP_API_CACHE_CONTROL)
+        if cached is not None:
+            cached.headers["Vary"] = "Accept-Encoding"
+            return cached
         
+        recent_lines = await asyncio.to_thread(read_log_tail, settings.LOG_FILE, limit)
+        if recent_lines is None:
+            return {"logs": [], "message": "로그 파일이 존재하지 않습니다."}
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = settings.HTTP_API_CACHE_CONTROL
+        # 압축되지 않는 작은 응답에도 Vary 유지 (압축 시 GZip 미들웨어가 같은 값을 한 번 더 덧붙임)
+        response.headers["Vary"] = "Accept-Encoding"
         return {
-            "logs": [line.strip() for line in recent_lines],
+            "logs": recent_lines,
             "total_lines": len(recent_lines),
             "file_path": settings.LOG_FILE
         }
@@ -172,10 +506,7 @@ async def get_logs(
 async def clear_logs(admin: str = Depends(verify_admin_credentials)):
     """로그 파일 초기화"""
     try:
-        if os.path.exists(settings.LOG_FILE):
-            with open(settings.LOG_FILE, 'w', encoding='utf-8') as f:
-                f.write("")
-            
+        if await asyncio.to_thread(truncate_log_file, settings.LOG_FILE):
             logger.info(f"관리자 {admin}이 로그 파일을 초기화했습니다.")
             return {"status": "success", "message": "로그 파일이 초기화되었습니다."}
         else:
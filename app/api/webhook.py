@@ -3,14 +3,25 @@
 메신저 봇 R 앱과의 통신을 위한 웹훅 처리
 """
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
 from loguru import logger
+from typing import Any, Optional
+import asyncio
 import time
 from datetime import datetime
 
 from app.models.message import IncomingMessage, ProcessedMessage, WebhookResponse
 from app.services.openai_service import openai_service
+from app.services.usage_ledger import usage_ledger
+from app.services.dedupe import delivery_deduper
+from app.services.traffic_capture import traffic_capture
+from app.services.traffic_sketch import traffic_sketch
+from app.services.ws_sessions import ws_sessions, WebSocketConnection, WebSocketSession
+from app.services.mqtt_dispatch import mqtt_dispatcher
 from app.core.config import settings
+from app.core import profiling
+from app.core.logging import read_log_tail
 
 router = APIRouter()
 
@@ -21,15 +32,60 @@ async def process_message(message: IncomingMessage):
     
     이 엔드포인트는 메신저 봇 R 앱에서 카카오톡 메시지를 받아
     OpenAI LLM으로 처리한 후 응답을 반환합니다.
+    재전송된 동일 메시지는 원래 응답을 그대로 반환합니다.
     """
     start_time = time.time()
+    profiling.mark_handler_start()
+    traffic_capture.record("/webhook/message", message.dict())
+    traffic_sketch.record(message.room, message.sender, message.message)
     
-    logger.info(f"📱 메시지 수신 - 방: {message.room}, 발신자: {message.sender}")
-    logger.debug(f"메시지 내용: {message.message}")
+    with profiling.stage("logging"):
+        logger.info(f"📱 메시지 수신 - 방: {message.room}, 발신자: {message.sender}")
+        logger.debug(f"메시지 내용: {message.message}")
     
     try:
-        # OpenAI로 메시지 처리
-        response_text = await openai_service.process_message(message.message)
+        fingerprint = delivery_deduper.fingerprint(message) if settings.DEDUPE_ENABLED else None
+        if fingerprint is None:
+            return await _handle_message(message, start_time)
+        
+        def duplicate_ack() -> ProcessedMessage:
+            logger.info(f"🔁 중복 메시지 수신 - 방: {message.room}")
+            return ProcessedMessage(room=message.room, message="", success=True, processing_time=0.0)
+        
+        return await delivery_deduper.run(
+            fingerprint,
+            lambda: _handle_message(message, start_time),
+            duplicate_ack,
+            keep=_is_replayable
+        )
+    finally:
+        profiling.mark_handler_end()
+
+def _is_replayable(result: ProcessedMessage) -> bool:
+    """재전송에 그대로 돌려줄 응답인지 (실패, 예산 초과, 서킷 열림/오류 대체 응답은 다시 처리)"""
+    return result.success and not openai_service.is_fallback_reply(result.message)
+
+async def _handle_message(message: IncomingMessage, start_time: float) -> ProcessedMessage:
+    """메시지를 LLM으로 처리하여 응답 생성"""
+    # 채팅방 토큰 예산 확인
+    if usage_ledger.is_over_budget(message.room):
+        logger.warning(f"⛔ 채팅방 토큰 예산 초과 - 방: {message.room}")
+        return ProcessedMessage(
+            room=message.room,
+            message="이 채팅방의 AI 사용량 한도를 초과했습니다. 잠시 후 다시 시도해주세요.",
+            success=False,
+            processing_time=round(time.time() - start_time, 2),
+            model_used=None
+        )
+    
+    try:
+        # OpenAI로 메시지 처리 (MQTT 모드에서는 워커에 맡기고 결과를 기다림)
+        with openai_service.trace_model() as trace:
+            if mqtt_dispatcher.enabled:
+                with profiling.stage("dispatch"):
+                    response_text = await mqtt_dispatcher.process_message(message.message, room=message.room)
+            else:
+                response_text = await openai_service.process_message(message.message, room=message.room)
         
         # 처리 시간 계산
         processing_time = time.time() - start_time
@@ -40,10 +96,11 @@ async def process_message(message: IncomingMessage):
             message=response_text,
             success=True,
             processing_time=round(processing_time, 2),
-            model_used=settings.OPENAI_MODEL if openai_service.is_available() else None
+            model_used=trace.model
         )
         
-        logger.info(f"✅ 메시지 처리 완료 - {processing_time:.2f}초 소요")
+        with profiling.stage("logging"):
+            logger.info(f"✅ 메시지 처리 완료 - {processing_time:.2f}초 소요")
         return processed_message
         
     except Exception as e:
@@ -58,6 +115,165 @@ async def process_message(message: IncomingMessage):
             model_used=None
         )
 
+# WebSocket 메시지 처리 작업 (가비지 컬렉션 방지용 참조)
+_ws_tasks = set()
+
+@router.websocket("/ws")
+async def websocket_channel(websocket: WebSocket):
+    """
+    메신저 봇 R 지속 연결 채널
+    
+    연결마다 HTTP 요청을 새로 만들지 않고 하나의 WebSocket으로 여러 메시지를 주고받습니다.
+    - 클라이언트 → 서버: hello(세션 재개), message(id로 요청 구분), ack(받은 응답 순번), ping/pong
+    - 서버 → 클라이언트: welcome, reply(id, seq), error, ping/pong
+    응답은 순번(seq)이 붙어 확인(ack) 전까지 보관되므로, 재연결 시 hello에 세션과
+    마지막으로 받은 순번을 보내면 그 이후 응답을 다시 받을 수 있습니다.
+    """
+    await websocket.accept()
+    try:
+        first = await asyncio.wait_for(websocket.receive_json(), timeout=settings.WS_HEARTBEAT_TIMEOUT)
+    except (asyncio.TimeoutError, WebSocketDisconnect, ValueError):
+        await _close_quietly(websocket)
+        return
+    
+    hello = first if isinstance(first, dict) and first.get("type") == "hello" else {}
+    session, resumed = ws_sessions.open(hello.get("session"))
+    connection = WebSocketConnection()
+    # 재전송할 응답이 송신 큐 크기보다 많아도 막히지 않도록 송신 작업을 먼저 시작
+    writer = asyncio.create_task(_ws_writer(websocket, connection))
+    heartbeat = asyncio.create_task(_ws_heartbeat(connection))
+    try:
+        session.attach(connection)
+        await connection.send({
+            "type": "welcome",
+            "session": session.id,
+            "resumed": resumed,
+            "heartbeat_interval": settings.WS_HEARTBEAT_INTERVAL,
+            "max_inflight": settings.WS_MAX_INFLIGHT
+        })
+        logger.info(f"🔌 WebSocket 연결 - 세션: {session.id}, 재개: {resumed}")
+        
+        if resumed:
+            last_seq = _parse_seq(hello.get("last_seq"))
+            if last_seq is None:
+                await connection.send({"type": "error", "detail": "last_seq는 정수여야 합니다. 보관 중인 응답을 모두 다시 보냅니다."})
+                last_seq = 0
+            session.ack(last_seq)
+            # 클라이언트가 읽지 않아 재전송이 멈추면 하트비트 시간 초과로 종료
+            await asyncio.wait_for(
+                _ws_replay(connection, session.pending_after(last_seq)),
+                timeout=settings.WS_HEARTBEAT_TIMEOUT
+            )
+        
+        if not hello:
+            await _ws_handle_frame(session, connection, first)
+        while not writer.done() and not connection.closed:
+            # 하트비트 시간 동안 아무 프레임도 받지 못하면 연결 종료
+            frame = await asyncio.wait_for(websocket.receive_json(), timeout=settings.WS_HEARTBEAT_TIMEOUT)
+            await _ws_handle_frame(session, connection, frame)
+    except asyncio.TimeoutError:
+        logger.info(f"WebSocket 하트비트 시간 초과 - 세션: {session.id}")
+    except (WebSocketDisconnect, RuntimeError, ValueError):
+        pass
+    finally:
+        heartbeat.cancel()
+        writer.cancel()
+        session.detach(connection)
+        await _close_quietly(websocket)
+        logger.info(f"🔌 WebSocket 연결 종료 - 세션: {session.id}")
+
+def _parse_seq(value: Any) -> Optional[int]:
+    """클라이언트가 보낸 순번 (없으면 0, 정수가 아니면 None)"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+async def _ws_replay(connection: WebSocketConnection, frames):
+    for frame in frames:
+        await connection.send(frame)
+
+async def _ws_handle_frame(session: WebSocketSession, connection: WebSocketConnection, frame: Any):
+    """클라이언트 프레임 처리"""
+    if not isinstance(frame, dict):
+        await connection.send({"type": "error", "detail": "JSON 객체 형식의 프레임이 필요합니다."})
+        return
+    
+    frame_type = frame.get("type")
+    if frame_type == "message":
+        correlation_id = frame.get("id")
+        try:
+            message = IncomingMessage(**(frame.get("payload") or {}))
+        except (ValidationError, TypeError) as e:
+            await connection.send({"type": "error", "id": correlation_id, "detail": str(e)})
+            return
+        
+        # 동시 처리 수가 가득 차면 다음 프레임을 읽지 않고 대기 (TCP 수준 배압)
+        try:
+            await asyncio.wait_for(session.slots.acquire(), timeout=settings.WS_HEARTBEAT_TIMEOUT)
+        except asyncio.TimeoutError:
+            await connection.send({"type": "error", "id": correlation_id, "detail": "처리 대기 시간을 초과했습니다. 다시 보내주세요."})
+            return
+        session.inflight += 1
+        ws_sessions.messages += 1
+        task = asyncio.create_task(_ws_process(session, correlation_id, message))
+        _ws_tasks.add(task)
+        task.add_done_callback(_ws_tasks.discard)
+    elif frame_type == "ack":
+        seq = _parse_seq(frame.get("seq"))
+        if seq is None:
+            await connection.send({"type": "error", "detail": "ack의 seq는 정수여야 합니다."})
+            return
+        session.ack(seq)
+    elif frame_type == "ping":
+        await connection.send({"type": "pong", "ts": frame.get("ts")})
+    elif frame_type in ("pong", "hello"):
+        pass
+    else:
+        await connection.send({"type": "error", "detail": f"알 수 없는 프레임 유형: {frame_type}"})
+
+async def _ws_process(session: WebSocketSession, correlation_id: Any, message: IncomingMessage):
+    """HTTP 웹훅과 같은 처리 경로로 메시지를 처리하고 응답을 세션에 전달"""
+    try:
+        result = await process_message(message)
+        await session.push({"type": "reply", "id": correlation_id, "payload": result.dict()})
+    except Exception as e:
+        logger.error(f"❌ WebSocket 메시지 처리 실패: {e}")
+        await session.push({"type": "error", "id": correlation_id, "detail": "메시지 처리 중 오류가 발생했습니다."})
+    finally:
+        session.inflight -= 1
+        session.slots.release()
+
+async def _ws_writer(websocket: WebSocket, connection: WebSocketConnection):
+    """송신 큐의 프레임을 순서대로 전송 (전송이 실패하면 연결을 닫아 대기 중인 송신을 풀어줌)"""
+    try:
+        while True:
+            frame = await connection.queue.get()
+            await websocket.send_json(frame)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # 서버 구현에 따라 닫힌 소켓 전송 오류 종류가 다름 (예: uvicorn은 websockets의 ConnectionClosed)
+        logger.debug(f"WebSocket 전송 중단: {type(e).__name__}")
+    finally:
+        connection.close()
+
+async def _ws_heartbeat(connection: WebSocketConnection):
+    """주기적으로 ping 전송"""
+    while not connection.closed:
+        await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+        await connection.send({"type": "ping", "ts": time.time()})
+
+async def _close_quietly(websocket: WebSocket):
+    try:
+        await websocket.close()
+    except Exception:
+        pass
+
 @router.get("/status")
 async def webhook_status():
     """웹훅 상태 확인"""
@@ -65,6 +281,8 @@ async def webhook_status():
         "status": "active",
         "service": "카카오톡 메신저 봇 R 웹훅",
         "openai_available": openai_service.is_available(),
+        "circuit_breaker": openai_service.breaker.snapshot(),
+        "websocket": ws_sessions.snapshot(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -96,12 +314,14 @@ async def test_webhook(request: dict):
 @router.post("/summary")
 async def create_summary(request: dict):
     """메시지 요약 전용 엔드포인트"""
+    traffic_capture.record("/webhook/summary", request)
     message = request.get("message", "")
     lines = request.get("lines", 3)
     
     if not message:
         raise HTTPException(status_code=400, detail="메시지가 필요합니다.")
     
+    profiling.mark_handler_start()
     try:
         from app.models.message import MessageSummaryRequest
         summary_request = MessageSummaryRequest(
@@ -109,36 +329,39 @@ async def create_summary(request: dict):
             lines=lines
         )
         
-        summary = await openai_service.summarize_message(summary_request)
+        with openai_service.trace_model() as trace:
+            if mqtt_dispatcher.enabled:
+                with profiling.stage("dispatch"):
+                    summary = await mqtt_dispatcher.summarize_message(summary_request)
+            else:
+                summary = await openai_service.summarize_message(summary_request)
         
         return {
             "status": "success",
             "original_message": message,
             "summary": summary,
             "lines": lines,
-            "model_used": settings.OPENAI_MODEL if openai_service.is_available() else None
+            "model_used": trace.model
         }
         
     except Exception as e:
         logger.error(f"요약 생성 실패: {e}")
         raise HTTPException(status_code=500, detail=f"요약 생성 중 오류: {str(e)}")
+    finally:
+        profiling.mark_handler_end()
 
 @router.get("/logs")
 async def get_recent_logs(limit: int = 50):
     """최근 로그 조회 (개발/디버깅 용도)"""
     try:
-        import os
         log_file = settings.LOG_FILE
+        recent_lines = await asyncio.to_thread(read_log_tail, log_file, limit)
         
-        if not os.path.exists(log_file):
+        if recent_lines is None:
             return {"logs": [], "message": "로그 파일이 없습니다."}
-        
-        with open(log_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            recent_lines = lines[-limit:] if len(lines) > limit else lines
             
         return {
-            "logs": [line.strip() for line in recent_lines],
+            "logs": recent_lines,
             "total_lines": len(recent_lines),
             "log_file": log_file
         }
@@ -156,6 +379,7 @@ async def get_webhook_config():
         "test_url": f"http://{settings.HOST}:{settings.PORT}/webhook/test",
         "summary_url": f"http://{settings.HOST}:{settings.PORT}/webhook/summary",
         "status_url": f"http://{settings.HOST}:{settings.PORT}/webhook/status",
+        "websocket_url": f"ws://{settings.HOST}:{settings.PORT}/webhook/ws",
         "supported_methods": ["POST"],
         "content_type": "application/json",
         "example_payload": {
@@ -21,17 +21,149 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_MAX_TOKENS: int = 500
     OPENAI_TEMPERATURE: float = 0.7
-    
+    OPENAI_TIMEOUT: float = 30.0  # 초
+    OPENAI_BASE_URL: str = ""  # 비워두면 기본 OpenAI 엔드포인트 (재생 테스트용 스텁 서버 지정 가능)
+
+    # API 키 풀 설정
+    OPENAI_API_KEYS: List[str] = []  # OPENAI_API_KEY 외 추가 키 (JSON 배열, 예: ["sk-a", "sk-b"])
+    OPENAI_KEY_RESERVE_RATIO: float = 0.02  # 한도 초기화 전까지 남겨 둘 요청/토큰 비율
+    OPENAI_KEY_MAX_WAIT: float = 5.0  # 모든 키가 한도에 가까울 때 최대 대기 (초, 이보다 늦게 풀리면 바로 전송)
+    OPENAI_KEY_COOLDOWN_SECONDS: float = 20.0  # 429 응답에 재시도 시각이 없을 때 키 제외 시간 (초)
+    OPENAI_KEY_QUOTA_COOLDOWN_SECONDS: float = 600.0  # 할당량 소진/인증 실패 키 제외 시간 (초, 모든 키가 제외되면 즉시 실패)
+
+    # 서킷 브레이커 / 재시도 설정
+    OPENAI_BREAKER_WINDOW_SECONDS: int = 60
+    OPENAI_BREAKER_MIN_CALLS: int = 10
+    OPENAI_BREAKER_ERROR_RATE: float = 0.5
+    OPENAI_BREAKER_SLOW_CALL_SECONDS: float = 15.0
+    OPENAI_BREAKER_SLOW_CALL_RATE: float = 0.8
+    OPENAI_BREAKER_OPEN_SECONDS: int = 30
+    OPENAI_BREAKER_HALF_OPEN_PROBES: int = 3
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_RETRY_BASE_DELAY: float = 0.5
+    OPENAI_RETRY_MAX_DELAY: float = 4.0
+    OPENAI_RETRY_BUDGET_RATIO: float = 0.2
+    OPENAI_RETRY_BUDGET_MAX: int = 10
+
+    # 모델 라우팅 설정
+    OPENAI_ROUTING_ENABLED: bool = False
+    OPENAI_ROUTING_MODELS: List[str] = []  # OPENAI_MODEL 외 후보 모델
+    OPENAI_ROUTING_SHORT_INPUT_CHARS: int = 400
+    OPENAI_ROUTING_EWMA_ALPHA: float = 0.2
+    OPENAI_ROUTING_MAX_ERROR_RATE: float = 0.5
+    OPENAI_ROUTING_ERROR_PENALTY: float = 4.0
+    OPENAI_ROUTING_PROBE_INTERVAL: float = 60.0  # 오류율로 제외된 모델에 회복 확인 요청을 보내는 간격 (초)
+    OPENAI_TOKENS_PER_LINE: int = 80
+    OPENAI_MAX_TOKENS_HEADROOM: int = 40
+
+    # 사용량 원장 설정
+    USAGE_LEDGER_FILE: str = str(BASE_DIR / "logs" / "usage_ledger.json")
+    USAGE_FLUSH_INTERVAL: int = 60  # 초
+    USAGE_BUCKET_SECONDS: int = 3600
+    USAGE_MAX_BUCKETS: int = 168
+    USAGE_MAX_ROOMS: int = 10000
+    USAGE_ROOM_TOKEN_BUDGET: int = 0  # 0이면 예산 제한 없음
+    USAGE_BUDGET_PERIOD_SECONDS: int = 86400
+
+    # 프롬프트 압축 설정
+    PROMPT_COMPACTION_ENABLED: bool = True
+    PROMPT_MAX_INPUT_TOKENS: int = 1500  # 로컬 추정 기준 입력 토큰 예산
+
+    # 유사 메시지 요약 캐시 설정
+    SIMILARITY_CACHE_ENABLED: bool = True
+    SIMILARITY_MAX_DISTANCE: int = 0  # SimHash 해밍 거리 (최대 3, 0이면 정규화 결과가 같을 때만 재사용)
+    SIMILARITY_MIN_CHARS: int = 20  # 이보다 짧으면 정확히 같을 때만 재사용
+    SIMILARITY_CACHE_SIZE: int = 2000
+    SIMILARITY_CACHE_TTL: int = 3600  # 초
+    SIMILARITY_VERIFY_RATE: float = 0.0  # 적중 결과를 실제 요약과 비교할 비율
+    SIMILARITY_VERIFY_MAX_DISTANCE: int = 12
+
+    # 섀도 트래픽 평가 설정 (후보 모델/프롬프트 비교)
+    SHADOW_ENABLED: bool = False
+    SHADOW_SAMPLE_RATE: float = 0.05  # 섀도 실행할 요청 비율
+    SHADOW_MODEL: str = ""  # 비워두면 현재 요청이 라우팅된 모델 (프롬프트만 비교)
+    SHADOW_SYSTEM_PROMPT: str = ""  # 비워두면 기본 시스템 프롬프트
+    SHADOW_MAX_CONCURRENCY: int = 4  # 동시 섀도 호출 상한 (넘으면 건너뜀)
+    SHADOW_MAX_SAMPLES: int = 2000  # 지연 백분위 계산에 쓰는 최근 샘플 수
+
+    # 트래픽 구성 스케치 설정 (고정 메모리 상위 K/빈도/고유 수 추정)
+    SKETCH_ENABLED: bool = True
+    SKETCH_SLOT_SECONDS: int = 60  # 슬롯 길이 (초)
+    SKETCH_SLOTS: int = 60  # 유지할 슬롯 수 (최대 조회 창 = 슬롯 길이 x 슬롯 수)
+    SKETCH_TOP_K: int = 50  # 슬롯별 Space-Saving 카운터 수
+    SKETCH_CMS_WIDTH: int = 1024
+    SKETCH_CMS_DEPTH: int = 4
+    SKETCH_HLL_PRECISION: int = 11  # 레지스터 2^11개, 표준 오차 약 2.3%
+    SKETCH_PREVIEW_CHARS: int = 30  # 반복 메시지 미리보기 길이
+
+    # 웜 스타트 스냅샷 설정 (종료 시 메모리 상태 저장, 시작 시 복원)
+    WARM_START_ENABLED: bool = True
+    WARM_START_FILE: str = str(BASE_DIR / "logs" / "warm_start.bin")
+    WARM_START_MAX_AGE: int = 3600  # 이보다 오래된 스냅샷은 버림 (초)
+
     # 메신저 봇 R 설정
     MESSENGER_BOT_WEBHOOK_SECRET: str = ""
     ALLOWED_ORIGINS: List[str] = ["*"]
-    
+
+    # WebSocket 설정
+    WS_HEARTBEAT_INTERVAL: int = 20  # 초
+    WS_HEARTBEAT_TIMEOUT: int = 60  # 초
+    WS_MAX_INFLIGHT: int = 8  # 세션별 동시 처리 메시지 수
+    WS_SEND_QUEUE_SIZE: int = 64
+    WS_MAX_OUTBOX: int = 256  # 세션별 미확인 응답 보관 개수
+    WS_RESUME_TTL: int = 300  # 연결이 끊긴 세션 유지 시간 (초)
+
+    # 재전송 중복 제거 설정
+    DEDUPE_ENABLED: bool = True
+    DEDUPE_WINDOW_SECONDS: int = 120
+    DEDUPE_MAX_REPLIES: int = 5000  # 세대별 응답 보관 개수
+    DEDUPE_MAX_FINGERPRINTS: int = 50000  # 세대별 지문만 보관하는 개수
+
+    # MQTT 작업 분산 설정 (활성화하면 LLM 처리를 워커 프로세스에 맡김)
+    MQTT_ENABLED: bool = False
+    MQTT_HOST: str = "localhost"  # "local"이면 프로세스 내 브로커 + 내장 워커 사용 (테스트용)
+    MQTT_PORT: int = 1883
+    MQTT_USERNAME: str = ""
+    MQTT_PASSWORD: str = ""
+    MQTT_TOPIC_PREFIX: str = "kakao-bot"
+    MQTT_SHARE_GROUP: str = "llm-workers"  # 공유 구독 그룹 ($share/<그룹>/<토픽>)
+    MQTT_QOS: int = 1
+    MQTT_REQUEST_TIMEOUT: float = 60.0  # 워커 응답 대기 시간 (초)
+    MQTT_WORKER_CONCURRENCY: int = 8  # 워커별 동시 처리 작업 수
+    MQTT_LOCAL_WORKERS: int = 2  # MQTT_HOST="local"일 때 내장 워커 수
+    MQTT_RECONNECT_DELAY: float = 5.0  # 초
+
     # 로깅 설정
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = str(BASE_DIR / "logs" / "app.log")
     LOG_ROTATION: str = "1 day"
     LOG_RETENTION: str = "7 days"
     
+    # 트래픽 수집 설정
+    TRAFFIC_CAPTURE_ENABLED: bool = False
+    TRAFFIC_CAPTURE_FILE: str = str(BASE_DIR / "logs" / "traffic" / "capture.jsonl.gz")
+    TRAFFIC_CAPTURE_ANONYMIZE: bool = True  # 방/발신자/메시지 가명 처리 (익명화 아님)
+    TRAFFIC_CAPTURE_BUFFER_SIZE: int = 500
+    TRAFFIC_CAPTURE_FLUSH_INTERVAL: int = 5  # 초
+    
+    # 프로파일링 설정
+    SERVER_TIMING_ENABLED: bool = True
+    PROFILER_OUTPUT_DIR: str = str(BASE_DIR / "logs" / "profiles")
+    PROFILER_MAX_DURATION: int = 300  # 초
+
+    # 이벤트 루프 모니터 설정
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.1  # 지연 측정 간격 (초)
+    LOOP_BLOCK_THRESHOLD: float = 0.25  # 이보다 오래 루프를 점유한 콜백의 스택 기록 (초)
+    LOOP_MONITOR_SAMPLES: int = 3000  # 백분위 계산에 쓰는 최근 지연 샘플 수
+    LOOP_MONITOR_MAX_EVENTS: int = 50  # 보관할 최근 차단 기록 수
+    
+    # HTTP 응답 압축/캐시 설정
+    HTTP_GZIP_MIN_SIZE: int = 1024  # 이보다 큰 응답만 gzip 압축 (바이트, 0이면 압축 안 함)
+    HTTP_GZIP_LEVEL: int = 6  # 압축 수준 (높을수록 작지만 CPU 사용 증가)
+    HTTP_STATIC_CACHE_CONTROL: str = "no-cache"  # 메인/대시보드 페이지 (매번 ETag로 재검증)
+    HTTP_API_CACHE_CONTROL: str = "private, no-cache"  # 조건부 요청을 지원하는 관리자 API
+
     # 관리자 설정
     ADMIN_USERNAME: str = "admin"
     ADMIN_PASSWORD: str = "password123"
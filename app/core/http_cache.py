@@ -0,0 +1,94 @@
+"""
+HTTP 조건부 요청/압축 도구
+고정된 페이지는 한 번만 인코딩·압축하여 강한 ETag와 함께 보관하고,
+If-None-Match가 일치하면 본문 없이 304로 응답
+"""
+
+from fastapi import Request, Response
+from typing import Dict, Iterable, Optional
+import gzip
+import hashlib
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성 (설치되어 있으면 정적 페이지를 br로도 미리 압축)
+    brotli = None
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding -> {인코딩: q값}"""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+def choose_encoding(request: Request, available: Iterable[Optional[str]]) -> Optional[str]:
+    """클라이언트가 받을 수 있는 가장 작은 인코딩 (br > gzip > 압축 없음)"""
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def etag_matches(request: Request, etags: Iterable[str]) -> bool:
+    """If-None-Match가 ETag 중 하나와 일치하는지 (약한 비교)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(etag.removeprefix("W/") in candidates for etag in etags)
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """조건부 요청이 일치하면 304 응답, 아니면 None"""
+    if etag_matches(request, (etag,)):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
+
+class StaticPage:
+    """미리 압축해 둔 고정 응답 (원본/gzip/br 변형별 강한 ETag)"""
+
+    def __init__(self, content: str, media_type: str = "text/html; charset=utf-8", cache_control: Optional[str] = None):
+        body = content.encode("utf-8")
+        self.media_type = media_type
+        self.cache_control = cache_control or settings.HTTP_STATIC_CACHE_CONTROL
+        self.variants: Dict[Optional[str], bytes] = {
+            None: body,
+            "gzip": gzip.compress(body, compresslevel=9, mtime=0)
+        }
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # 인코딩마다 바이트가 다르므로 ETag도 구분
+        self.etags = {
+            encoding: f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+            for encoding in self.variants
+        }
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request, self.variants)
+        headers = {
+            "ETag": self.etags[encoding],
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding"
+        }
+        # 내용이 같으면 어느 인코딩으로 받아 둔 사본이든 유효
+        if etag_matches(request, self.etags.values()):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
\ No newline at end of file
@@ -2,7 +2,10 @@
 로깅 설정
 """
 
+from collections import deque
 from loguru import logger
+from typing import List, Optional
+import os
 import sys
 from app.core.config import settings
 
@@ -26,5 +29,29 @@ def setup_logging():
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
         rotation=settings.LOG_ROTATION,
         retention=settings.LOG_RETENTION,
-        encoding="utf-8"
-    )
\ No newline at end of file
+        encoding="utf-8",
+        enqueue=True  # 파일 쓰기는 별도 스레드에서 (이벤트 루프 차단 방지)
+    )
+
+def read_log_tail(path: str, limit: int) -> Optional[List[str]]:
+    """로그 파일의 마지막 limit줄 (파일이 없으면 None, asyncio.to_thread로 호출)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in deque(f, maxlen=max(limit, 0))]
+
+def log_file_version(path: str) -> Optional[str]:
+    """로그 파일 크기/수정 시각 기반 버전 (파일이 없으면 None, asyncio.to_thread로 호출)"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+def truncate_log_file(path: str) -> bool:
+    """로그 파일 비우기 (파일이 없으면 False, asyncio.to_thread로 호출)"""
+    if not os.path.exists(path):
+        return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("")
+    return True
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+이벤트 루프 상태 모니터
+루프 지연(lag)을 계속 측정하고, 임계값보다 오래 루프를 점유한 콜백의 스택을 감시 스레드가 기록
+"""
+
+from collections import Counter, deque
+from loguru import logger
+from typing import Dict, List, Optional, Any
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+
+from app.core.config import settings
+from app.core.stats import percentile
+
+# 위치 요약에서 건너뛸 표준 라이브러리/설치 패키지 경로
+_LIBRARY_PATHS = tuple({
+    os.path.normcase(path)
+    for key in ("stdlib", "platstdlib", "purelib", "platlib")
+    if (path := sysconfig.get_paths().get(key))
+})
+
+class BlockEvent:
+    """루프를 점유한 콜백 하나"""
+
+    __slots__ = ("started_at", "detected_at", "duration", "location", "stack")
+
+    def __init__(self, started_at: float, location: str, stack: List[str]):
+        self.started_at = started_at
+        self.detected_at = time.time()
+        self.duration: Optional[float] = None
+        self.location = location
+        self.stack = stack
+
+    def to_dict(self, with_stack: bool = True) -> Dict[str, Any]:
+        data = {
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "location": self.location
+        }
+        if with_stack:
+            data["stack"] = self.stack
+        return data
+
+class EventLoopMonitor:
+    """루프 지연 측정 및 차단 콜백 감지
+
+    루프 안의 하트비트 작업이 LOOP_MONITOR_INTERVAL마다 깨어나며 예정 시각과의 차이(지연)를 기록하고,
+    별도 감시 스레드는 하트비트가 LOOP_BLOCK_THRESHOLD 이상 멈추면 그 순간의 루프 스레드 스택을 남깁니다.
+    """
+
+    def __init__(self):
+        self.active = False
+        self._lags: deque = deque(maxlen=settings.LOOP_MONITOR_SAMPLES)
+        self._events: deque = deque(maxlen=settings.LOOP_MONITOR_MAX_EVENTS)
+        self._offenders: Counter = Counter()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._current: Optional[BlockEvent] = None
+        self.started_at: Optional[float] = None
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.blocked_seconds = 0.0
+
+    def start(self):
+        """이벤트 루프 스레드에서 호출"""
+        if not settings.LOOP_MONITOR_ENABLED or self.active:
+            return
+        self.active = True
+        self.started_at = time.time()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"이벤트 루프 모니터 시작 - 측정 간격: {settings.LOOP_MONITOR_INTERVAL}초, "
+            f"차단 임계값: {settings.LOOP_BLOCK_THRESHOLD}초"
+        )
+
+    async def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        self._stop_event.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, 2)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        interval = settings.LOOP_MONITOR_INTERVAL
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self._lags.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+            # 감시 스레드가 잡은 차단이 끝났으므로 실제 점유 시간 기록
+            event = self._current
+            if event is not None:
+                self._current = None
+                event.duration = lag
+                self.blocked_seconds += lag
+                logger.warning(f"🐢 이벤트 루프 차단 {lag * 1000:.0f}ms - {event.location}")
+
+    def _watch(self):
+        threshold = settings.LOOP_BLOCK_THRESHOLD
+        poll = min(threshold / 2, settings.LOOP_MONITOR_INTERVAL)
+        while not self._stop_event.wait(poll):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - settings.LOOP_MONITOR_INTERVAL
+            if stalled < threshold or self._current is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            del frame
+            # 하트비트 이후 지금까지 같은 차단이면 한 번만 기록
+            if self._last_beat != last_beat:
+                continue
+            event = BlockEvent(time.time() - stalled, self._locate(stack), [line.rstrip() for line in stack])
+            self._current = event
+            self._events.append(event)
+            self._offenders[event.location] += 1
+            self.blocks += 1
+
+    @staticmethod
+    def _locate(stack: List[str]) -> str:
+        """스택에서 라이브러리가 아닌 가장 안쪽 프레임 위치 (없으면 가장 안쪽 프레임)"""
+        for entry in reversed(stack):
+            first_line = entry.strip().split("\n", 1)[0]
+            path = first_line[6:].split('"', 1)[0] if first_line.startswith('File "') else ""
+            if path and not os.path.normcase(path).startswith(_LIBRARY_PATHS) and not path.endswith("loop_monitor.py"):
+                return first_line
+        return stack[-1].strip().split("\n", 1)[0] if stack else "(알 수 없음)"
+
+    def reset(self):
+        """측정값 초기화"""
+        self._lags.clear()
+        self._events.clear()
+        self._offenders.clear()
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.blocked_seconds = 0.0
+        self.started_at = time.time()
+
+    def snapshot(self, event_limit: int = 10, with_stacks: bool = True) -> Dict[str, Any]:
+        """루프 지연 백분위(ms)와 최근 차단 기록"""
+        ordered = sorted(self._lags)
+        return {
+            "active": self.active,
+            "started_at": self.started_at,
+            "interval_ms": round(settings.LOOP_MONITOR_INTERVAL * 1000, 1),
+            "block_threshold_ms": round(settings.LOOP_BLOCK_THRESHOLD * 1000, 1),
+            "lag_ms": {
+                "samples": len(ordered),
+                "p50": round(percentile(ordered, 50) * 1000, 2),
+                "p90": round(percentile(ordered, 90) * 1000, 2),
+                "p99": round(percentile(ordered, 99) * 1000, 2),
+                "max_recent": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+                "max": round(self.max_lag * 1000, 2)
+            },
+            "blocks": self.blocks,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "top_offenders": [
+                {"location": location, "count": count}
+                for location, count in self._offenders.most_common(10)
+            ],
+            "recent_blocks": [
+                event.to_dict(with_stacks) for event in list(self._events)[-event_limit:][::-1]
+            ] if event_limit > 0 else []
+        }
+
+# 전역 이벤트 루프 모니터 인스턴스
+loop_monitor = EventLoopMonitor()
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+요청 단위 프로파일링
+단계별 처리 시간(Server-Timing 헤더)과 관리자가 실행하는 샘플링 프로파일러
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from datetime import datetime
+from loguru import logger
+from pathlib import Path
+from typing import Dict, Optional, Any
+import os
+import sys
+import threading
+import time
+
+from app.core.config import settings
+
+# max_requests 집계 대상 (관리자 API, 대시보드 폴링 등은 세지 않음)
+PROFILED_PATH_PREFIX = "/webhook/"
+
+class StageTimer:
+    """요청 하나의 단계별 소요 시간"""
+
+    __slots__ = ("start", "stages", "handler_end")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.handler_end: Optional[float] = None
+
+    def add(self, name: str, duration: float):
+        self.stages[name] = self.stages.get(name, 0.0) + duration
+
+    def server_timing(self, end: float) -> str:
+        """Server-Timing 헤더 값 (ms)"""
+        entries = dict(self.stages)
+        if self.handler_end is not None:
+            entries["serialization"] = end - self.handler_end
+        entries["total"] = end - self.start
+        return ", ".join(f"{name};dur={duration * 1000:.2f}" for name, duration in entries.items())
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+def begin_request() -> StageTimer:
+    """현재 요청의 타이머 생성 (미들웨어에서 호출)"""
+    timer = StageTimer()
+    _current_timer.set(timer)
+    return timer
+
+@contextmanager
+def stage(name: str):
+    """단계 소요 시간 측정 (타이머가 없는 요청에서는 아무 일도 하지 않음)"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+def mark_handler_start(name: str = "validation"):
+    """요청 수신부터 핸들러 진입까지(본문 파싱/검증)를 기록"""
+    timer = _current_timer.get()
+    if timer is not None and name not in timer.stages:
+        timer.add(name, time.perf_counter() - timer.start)
+
+def mark_handler_end():
+    """핸들러 종료 시각 기록 (이후는 응답 직렬화 시간)"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.handler_end = time.perf_counter()
+
+class ServerTimingMiddleware:
+    """요청마다 StageTimer를 만들고 응답에 Server-Timing 헤더를 추가하는 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = begin_request()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.server_timing(time.perf_counter()).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if sampling_profiler.active and scope["path"].startswith(PROFILED_PATH_PREFIX):
+                sampling_profiler.on_request_done()
+
+class SamplingProfiler:
+    """이벤트 루프 스레드의 스택을 주기적으로 샘플링하여 collapsed-stack 형식으로 기록
+
+    비활성 상태에서는 샘플링 스레드가 없고 미들웨어가 플래그 하나만 확인합니다.
+    출력 파일은 flamegraph.pl, speedscope 등에서 바로 읽을 수 있습니다.
+    """
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._samples: Counter = Counter()
+        self._target_thread_id: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.max_requests: Optional[int] = None
+        self.interval = 0.01
+        self.requests = 0
+        self.sample_count = 0
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    def start(self, duration_seconds: float, max_requests: Optional[int] = None, interval_ms: float = 10.0) -> Dict[str, Any]:
+        """프로파일링 시작 (이벤트 루프 스레드에서 호출)"""
+        with self._lock:
+            if self.active:
+                raise RuntimeError("프로파일러가 이미 실행 중입니다.")
+            duration_seconds = min(float(duration_seconds), settings.PROFILER_MAX_DURATION)
+            self._samples = Counter()
+            self._target_thread_id = threading.get_ident()
+            self._stop_event.clear()
+            self.started_at = time.time()
+            self.deadline = self.started_at + duration_seconds
+            self.max_requests = max_requests
+            self.interval = max(1.0, float(interval_ms)) / 1000
+            self.requests = 0
+            self.sample_count = 0
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"샘플링 프로파일러 시작 - 최대 {duration_seconds}초, 요청 {max_requests or '제한 없음'}")
+        return self.status()
+
+    def on_request_done(self):
+        """프로파일링 중 완료된 웹훅 요청 수 집계"""
+        self.requests += 1
+        if self.max_requests and self.requests >= self.max_requests:
+            self._stop_event.set()
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """프로파일링 중지 후 결과 파일 기록"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        return self.last_result
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set() and time.time() < self.deadline:
+                frame = sys._current_frames().get(self._target_thread_id)
+                if frame is not None:
+                    self._samples[self._collapse(frame)] += 1
+                    self.sample_count += 1
+                self._stop_event.wait(self.interval)
+        finally:
+            self._finish()
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _finish(self):
+        with self._lock:
+            self.active = False
+            self._thread = None
+            output_dir = Path(settings.PROFILER_OUTPUT_DIR)
+            path = output_dir / f"profile-{datetime.now():%Y%m%d-%H%M%S}.collapsed"
+            try:
+                output_dir.mkdir(parents=True, exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in self._samples.most_common():
+                        f.write(f"{stack} {count}\n")
+                written = str(path)
+            except Exception as e:
+                logger.error(f"프로파일 결과 기록 실패: {e}")
+                written = None
+            self.last_result = {
+                "file": written,
+                "started_at": self.started_at,
+                "duration_seconds": round(time.time() - self.started_at, 2),
+                "requests": self.requests,
+                "samples": self.sample_count,
+                "unique_stacks": len(self._samples)
+            }
+            self._samples = Counter()
+        logger.info(f"샘플링 프로파일러 종료 - 샘플 {self.sample_count}개, 파일: {written}")
+
+    def status(self) -> Dict[str, Any]:
+        """프로파일러 상태"""
+        return {
+            "active": self.active,
+            "started_at": self.started_at if self.active else None,
+            "deadline": self.deadline if self.active else None,
+            "max_requests": self.max_requests if self.active else None,
+            "interval_ms": round(self.interval * 1000, 1),
+            "requests": self.requests if self.active else None,
+            "samples": self.sample_count if self.active else None,
+            "last_result": self.last_result
+        }
+
+# 전역 프로파일러 인스턴스
+sampling_profiler = SamplingProfiler()
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""
+통계 도구
+지연 시간 분포 보고에 쓰는 공용 함수
+"""
+
+from typing import Sequence
+
+def percentile(ordered: Sequence[float], pct: float) -> float:
+    """정렬된 값의 백분위 (nearest-rank, 값이 없으면 0.0)"""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
\ No newline at end of file
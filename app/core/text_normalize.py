@@ -0,0 +1,32 @@
+"""
+채팅 메시지 잡음 정규화
+유사 메시지 캐시와 프롬프트 압축이 같은 기준으로 잡음(이모지/기호, 제어 문자, 반복 자모, URL 추적 파라미터, 공백)을 판단하도록 공유
+"""
+
+import re
+import unicodedata
+
+# 그룹 1: 쿼리/프래그먼트(추적 파라미터)를 뺀 URL, 그룹 2: 호스트
+URL_PATTERN = re.compile(r"(https?://([^/\s?#]+)[^\s?#]*)\S*")
+WHITESPACE_PATTERN = re.compile(r"[ \t　]+")
+# ㅋㅋㅋㅋ, ㅠㅠㅠ, !!!! 처럼 3번 이상 반복되는 자모/문장부호
+REPEAT_PATTERN = re.compile(r"([ㄱ-ㅎㅏ-ㅣ!?.~^;:ㆍ])\1{2,}")
+
+def is_noise_char(ch: str) -> bool:
+    """이모지/기호(So, Sk)와 제어/서식 문자(이모지 변형 선택자, ZWJ 포함), 줄바꿈/탭 제외"""
+    if ch in "\n\t":
+        return False
+    return unicodedata.category(ch) in ("So", "Sk", "Cc", "Cf", "Co", "Cn") or ch == "\ufe0f"
+
+def strip_noise(text: str) -> str:
+    """NFC 정규화 후 잡음 문자 제거, 반복 자모/문장부호는 2번으로 축약"""
+    text = unicodedata.normalize("NFC", text)
+    text = "".join(ch for ch in text if not is_noise_char(ch))
+    return REPEAT_PATTERN.sub(r"\1\1", text)
+
+def strip_url_tracking(text: str) -> str:
+    """URL의 쿼리/프래그먼트 제거 (같은 링크는 같은 문자열로)"""
+    return URL_PATTERN.sub(r"\1", text)
+
+def collapse_whitespace(line: str) -> str:
+    return WHITESPACE_PATTERN.sub(" ", line).strip()
\ No newline at end of file
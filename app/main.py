@@ -5,10 +5,13 @@
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from typing import Optional
 import uvicorn
 from loguru import logger
+import asyncio
 import os
 from pathlib import Path
 
@@ -16,6 +19,13 @@ from app.api.webhook import router as webhook_router
 from app.api.admin import router as admin_router
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.profiling import ServerTimingMiddleware
+from app.core.http_cache import StaticPage
+from app.core.loop_monitor import loop_monitor
+from app.services.usage_ledger import usage_ledger
+from app.services.traffic_capture import traffic_capture
+from app.services.mqtt_dispatch import mqtt_dispatcher
+from app.services.warm_start import warm_start
 
 # 로깅 설정
 setup_logging()
@@ -38,6 +48,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 큰 응답(로그, 통계 등) gzip 압축 (Accept-Encoding에 gzip이 있고 HTTP_GZIP_MIN_SIZE 이상일 때)
+if settings.HTTP_GZIP_MIN_SIZE > 0:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.HTTP_GZIP_MIN_SIZE,
+        compresslevel=settings.HTTP_GZIP_LEVEL
+    )
+
+# 단계별 처리 시간 (Server-Timing) 및 샘플링 프로파일러 연동
+app.add_middleware(ServerTimingMiddleware)
+
 # API 라우터 등록
 app.include_router(webhook_router, prefix="/webhook", tags=["webhook"])
 app.include_router(admin_router, prefix="/admin", tags=["admin"])
@@ -52,10 +73,8 @@ public_path = Path(__file__).parent.parent / "public"
 if public_path.exists():
     app.mount("/public", StaticFiles(directory=str(public_path)), name="public")
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    """메인 페이지 - 관리자 대시보드로 리다이렉트"""
-    return """
+# 메인 페이지 (시작 시 한 번 인코딩/압축)
+ROOT_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -69,6 +88,12 @@ async def root():
     </body>
     </html>
     """
+root_page = StaticPage(ROOT_HTML)
+
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    """메인 페이지 - 관리자 대시보드로 리다이렉트"""
+    return root_page.response(request)
 
 @app.get("/health")
 async def health_check():
@@ -80,15 +105,8 @@ async def health_check():
         "messenger_bot_r": "연동 준비 완료"
     }
 
-@app.get("/admin/dashboard", response_class=HTMLResponse)
-async def admin_dashboard():
-    """관리자 대시보드 페이지"""
-    dashboard_file = public_path / "admin.html"
-    if dashboard_file.exists():
-        return FileResponse(str(dashboard_file))
-    
-    # 기본 대시보드 HTML
-    return """
+# 기본 대시보드 HTML (public/admin.html이 없을 때)
+DASHBOARD_HTML = """
     <!DOCTYPE html>
     <html lang="ko">
     <head>
@@ -133,6 +151,27 @@ async def admin_dashboard():
     </body>
     </html>
     """
+dashboard_page = StaticPage(DASHBOARD_HTML)
+_dashboard_file_cache = {}
+
+def _load_dashboard_file(path: Path) -> Optional[StaticPage]:
+    """public/admin.html을 읽어 압축 (파일이 바뀌었을 때만 다시 읽음, asyncio.to_thread로 호출)"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _dashboard_file_cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, StaticPage(path.read_text(encoding="utf-8")))
+        _dashboard_file_cache[path] = cached
+    return cached[1]
+
+@app.get("/admin/dashboard", response_class=HTMLResponse)
+async def admin_dashboard(request: Request):
+    """관리자 대시보드 페이지"""
+    page = await asyncio.to_thread(_load_dashboard_file, public_path / "admin.html")
+    return (page or dashboard_page).response(request)
 
 @app.on_event("startup")
 async def startup_event():
@@ -141,10 +180,27 @@ async def startup_event():
     logger.info(f"📱 웹훅 엔드포인트: http://localhost:{settings.PORT}/webhook/message")
     logger.info(f"📋 관리자 대시보드: http://localhost:{settings.PORT}/admin/dashboard")
     logger.info(f"💊 Health Check: http://localhost:{settings.PORT}/health")
+    
+    # 이벤트 루프 지연/차단 감시 시작
+    loop_monitor.start()
+    
+    # 사용량 원장 복원 및 주기적 기록 시작
+    await usage_ledger.start()
+    traffic_capture.on_startup()
+    # MQTT 작업 분산 (MQTT_ENABLED일 때만)
+    await mqtt_dispatcher.start()
+    # 이전 종료 시 저장한 상태를 백그라운드에서 복원
+    warm_start.on_startup()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """서버 종료 시 실행"""
+    await mqtt_dispatcher.stop()
+    # 원장 마지막 기록 전에 상태 저장
+    await warm_start.on_shutdown()
+    await usage_ledger.stop()
+    await traffic_capture.stop()
+    await loop_monitor.stop()
     logger.info("서버가 종료됩니다.")
 
 if __name__ == "__main__":
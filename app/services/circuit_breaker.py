@@ -0,0 +1,175 @@
+"""
+업스트림 호출용 서킷 브레이커 및 재시도 예산
+"""
+
+from collections import deque
+from typing import Dict, Any
+import random
+import time
+
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 호출을 즉시 거부할 때 발생"""
+    pass
+
+class CircuitBreaker:
+    """오류율/지연 시간 기반 서킷 브레이커
+
+    - closed: 최근 구간의 오류율 또는 느린 호출 비율이 임계값을 넘으면 open
+    - open: 일정 시간 동안 모든 호출을 즉시 거부
+    - half_open: 제한된 수의 시험 호출만 허용, 모두 성공하면 closed, 하나라도 실패하면 다시 open
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.window: deque = deque(maxlen=1000)  # (시각, 성공 여부, 지연 시간)
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.open_count = 0
+        self.rejected = 0
+        self.last_state_change = time.time()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self.last_state_change = time.time()
+            if state == OPEN:
+                self.opened_at = self.last_state_change
+                self.open_count += 1
+            if state == HALF_OPEN:
+                self.probes_in_flight = 0
+                self.probe_successes = 0
+            if state == CLOSED:
+                self.window.clear()
+
+    def _prune(self, now: float):
+        cutoff = now - settings.OPENAI_BREAKER_WINDOW_SECONDS
+        while self.window and self.window[0][0] < cutoff:
+            self.window.popleft()
+
+    def _window_rates(self):
+        calls = len(self.window)
+        if not calls:
+            return 0, 0.0, 0.0
+        failures = sum(1 for _, ok, _ in self.window if not ok)
+        slow = sum(1 for _, ok, latency in self.window
+                   if ok and latency >= settings.OPENAI_BREAKER_SLOW_CALL_SECONDS)
+        return calls, failures / calls, slow / calls
+
+    def allow_request(self) -> bool:
+        """호출 허용 여부 (half_open이면 시험 호출 슬롯을 점유)"""
+        now = time.time()
+        if self.state == OPEN:
+            if now - self.opened_at < settings.OPENAI_BREAKER_OPEN_SECONDS:
+                self.rejected += 1
+                return False
+            self._set_state(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= settings.OPENAI_BREAKER_HALF_OPEN_PROBES:
+                self.rejected += 1
+                return False
+            self.probes_in_flight += 1
+        return True
+
+    def release(self):
+        """결과 없이 끝난 호출(취소 등)의 시험 호출 슬롯 반환"""
+        if self.state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def record_success(self, latency: float):
+        """성공한 호출 기록 (느린 호출은 half_open에서 실패로 취급)"""
+        now = time.time()
+        if self.state == HALF_OPEN:
+            self.release()
+            if latency >= settings.OPENAI_BREAKER_SLOW_CALL_SECONDS:
+                self._set_state(OPEN)
+                return
+            self.probe_successes += 1
+            if self.probe_successes >= settings.OPENAI_BREAKER_HALF_OPEN_PROBES:
+                self._set_state(CLOSED)
+            return
+        self.window.append((now, True, latency))
+        self._evaluate(now)
+
+    def record_failure(self, latency: float):
+        """실패한 호출 기록"""
+        now = time.time()
+        if self.state == HALF_OPEN:
+            self.release()
+            self._set_state(OPEN)
+            return
+        self.window.append((now, False, latency))
+        self._evaluate(now)
+
+    def _evaluate(self, now: float):
+        self._prune(now)
+        calls, error_rate, slow_rate = self._window_rates()
+        if calls < settings.OPENAI_BREAKER_MIN_CALLS:
+            return
+        if (error_rate >= settings.OPENAI_BREAKER_ERROR_RATE
+                or slow_rate >= settings.OPENAI_BREAKER_SLOW_CALL_RATE):
+            self._set_state(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """브레이커 상태"""
+        now = time.time()
+        self._prune(now)
+        calls, error_rate, slow_rate = self._window_rates()
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, settings.OPENAI_BREAKER_OPEN_SECONDS - (now - self.opened_at))
+        return {
+            "name": self.name,
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": round(error_rate, 3),
+            "window_slow_rate": round(slow_rate, 3),
+            "open_count": self.open_count,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(retry_in, 1),
+            "last_state_change": self.last_state_change
+        }
+
+class RetryBudget:
+    """재시도 예산 (토큰 버킷)
+
+    첫 시도마다 OPENAI_RETRY_BUDGET_RATIO만큼 적립되고 재시도 한 번에 1씩 소모되어,
+    장애 시 재시도가 전체 트래픽을 증폭시키지 않도록 제한합니다.
+    """
+
+    def __init__(self):
+        self.tokens = float(settings.OPENAI_RETRY_BUDGET_MAX)
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(float(settings.OPENAI_RETRY_BUDGET_MAX),
+                          self.tokens + settings.OPENAI_RETRY_BUDGET_RATIO)
+
+    def try_acquire(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tokens": round(self.tokens, 2),
+            "retries": self.retries,
+            "exhausted": self.exhausted
+        }
+
+def backoff_delay(attempt: int) -> float:
+    """지수 백오프 + 전체 지터 (attempt는 0부터)"""
+    ceiling = min(settings.OPENAI_RETRY_MAX_DELAY, settings.OPENAI_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+웹훅 중복 전달 제거
+메신저 봇 R이 재전송한 동일 메시지를 시간 구간별로 만료되는 지문으로 식별
+"""
+
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import time
+
+from app.core.config import settings
+from app.models.message import IncomingMessage, ProcessedMessage
+
+class _Generation:
+    """한 시간 구간의 지문 저장소"""
+
+    __slots__ = ("start", "replies", "seen")
+
+    def __init__(self, start: float):
+        self.start = start
+        # 지문 -> 응답(또는 처리 중인 Future)
+        self.replies: Dict[bytes, Any] = {}
+        # 응답을 보관하지 못한 지문 (용량 초과 시)
+        self.seen: set = set()
+
+    def __len__(self) -> int:
+        return len(self.replies) + len(self.seen)
+
+class DeliveryDeduper:
+    """회전하는 세대(generation) 방식의 중복 메시지 필터
+
+    현재/이전 두 세대만 유지하므로 지문은 DEDUPE_WINDOW_SECONDS ~ 2배 사이에 만료되고,
+    세대별 저장 개수도 제한되어 메시지 유입량과 무관하게 메모리 사용량이 고정됩니다.
+    """
+
+    def __init__(self):
+        self.generations: deque = deque(maxlen=2)
+        self.lookups = 0
+        self.reply_hits = 0
+        self.inflight_hits = 0
+        self.ack_hits = 0
+        self.dropped = 0
+
+    @staticmethod
+    def fingerprint(message: IncomingMessage) -> Optional[bytes]:
+        """(방, 발신자, 타임스탬프, 메시지) 지문 (타임스탬프가 없으면 중복 판단 불가)"""
+        if message.timestamp is None:
+            return None
+        key = f"{message.room}\x00{message.sender}\x00{message.timestamp}\x00{message.message}"
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+    def _current(self) -> _Generation:
+        now = time.time()
+        window = settings.DEDUPE_WINDOW_SECONDS
+        if not self.generations or now - self.generations[-1].start >= window:
+            self.generations.append(_Generation(now))
+        # 두 세대보다 오래된 지문은 만료
+        while self.generations and now - self.generations[0].start >= window * 2:
+            self.generations.popleft()
+        if not self.generations:
+            self.generations.append(_Generation(now))
+        return self.generations[-1]
+
+    def _find(self, fp: bytes):
+        """저장된 응답 조회 (없으면 None, 지문만 있으면 True)"""
+        for generation in reversed(self.generations):
+            if fp in generation.replies:
+                return generation.replies[fp]
+            if fp in generation.seen:
+                return True
+        return None
+
+    def _store(self, generation: _Generation, fp: bytes, value: Any):
+        if fp in generation.replies or len(generation.replies) < settings.DEDUPE_MAX_REPLIES:
+            generation.replies[fp] = value
+        elif len(generation) < settings.DEDUPE_MAX_REPLIES + settings.DEDUPE_MAX_FINGERPRINTS:
+            generation.seen.add(fp)
+        else:
+            self.dropped += 1
+
+    def _discard(self, fp: bytes):
+        for generation in self.generations:
+            generation.replies.pop(fp, None)
+            generation.seen.discard(fp)
+
+    async def run(
+        self,
+        fp: bytes,
+        handler: Callable[[], Awaitable[Any]],
+        ack: Callable[[], Any],
+        keep: Callable[[Any], bool] = lambda result: True
+    ) -> Any:
+        """중복이면 원래 응답(또는 ack)을 반환하고, 처음 보는 메시지면 handler를 실행
+
+        keep(result)가 거짓인 결과(실패/대체 응답)는 저장하지 않아 재전송 시 다시 처리됩니다.
+        """
+        self.lookups += 1
+        generation = self._current()
+        found = self._find(fp)
+
+        if found is True:
+            self.ack_hits += 1
+            return ack()
+        if isinstance(found, asyncio.Future):
+            # 원본 요청이 아직 처리 중이면 같은 결과를 기다림
+            try:
+                result = await asyncio.shield(found)
+            except asyncio.CancelledError:
+                if not found.cancelled():
+                    raise
+                # 원본 요청이 취소되었으면 직접 처리
+                return await handler()
+            self.inflight_hits += 1
+            return result
+        if found is not None:
+            self.reply_hits += 1
+            return found
+
+        future = asyncio.get_running_loop().create_future()
+        self._store(generation, fp, future)
+        try:
+            result = await handler()
+        except BaseException as e:
+            # 실패한 요청은 재전송 시 다시 처리되도록 지문 제거
+            self._discard(fp)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # 대기자가 없을 때 경고 방지
+            raise
+        future.set_result(result)
+        if not keep(result):
+            self._discard(fp)
+            return result
+        for gen in self.generations:
+            if gen.replies.get(fp) is future:
+                gen.replies[fp] = result
+        return result
+
+    def export_state(self) -> Dict[str, Any]:
+        """웜 스타트 스냅샷용 상태 (처리 중인 요청은 제외, 응답이 아닌 값은 지문만 보관)"""
+        self._current()
+        generations = []
+        for generation in self.generations:
+            replies = {}
+            seen = [fp.hex() for fp in generation.seen]
+            for fp, value in generation.replies.items():
+                if isinstance(value, ProcessedMessage):
+                    replies[fp.hex()] = value.dict()
+                elif not isinstance(value, asyncio.Future):
+                    seen.append(fp.hex())
+            generations.append({"start": generation.start, "replies": replies, "seen": seen})
+        return {
+            "generations": generations,
+            "counters": [self.lookups, self.reply_hits, self.inflight_hits, self.ack_hits, self.dropped]
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """만료되지 않은 세대 복원
+
+        가장 최근 세대만 그대로 두고 나머지는 가장 이른 시작 시각의 이전 세대 하나로 합칩니다.
+        합쳐진 지문은 원래보다 일찍 만료될 수는 있어도 중복 제거 창보다 오래 남지 않습니다.
+        """
+        now = time.time()
+        restored = []
+        for data in state.get("generations", []):
+            if now - data["start"] >= settings.DEDUPE_WINDOW_SECONDS * 2:
+                continue
+            generation = _Generation(data["start"])
+            for fp_hex, reply in data.get("replies", {}).items():
+                generation.replies[bytes.fromhex(fp_hex)] = ProcessedMessage(**reply)
+            generation.seen.update(bytes.fromhex(fp_hex) for fp_hex in data.get("seen", []))
+            restored.append(generation)
+
+        ordered = sorted(list(self.generations) + restored, key=lambda g: g.start)
+        if len(ordered) > 2:
+            older = _Generation(ordered[0].start)
+            # 최근 세대의 응답이 우선
+            for generation in reversed(ordered[:-1]):
+                for fp, value in generation.replies.items():
+                    if fp not in older.replies and fp not in older.seen:
+                        self._store(older, fp, value)
+                for fp in generation.seen:
+                    if fp in older.replies or fp in older.seen:
+                        continue
+                    if len(older) < settings.DEDUPE_MAX_REPLIES + settings.DEDUPE_MAX_FINGERPRINTS:
+                        older.seen.add(fp)
+                    else:
+                        self.dropped += 1
+            ordered = [older, ordered[-1]]
+        self.generations.clear()
+        self.generations.extend(ordered)
+
+        counters = state.get("counters") or [0] * 5
+        self.lookups += counters[0]
+        self.reply_hits += counters[1]
+        self.inflight_hits += counters[2]
+        self.ack_hits += counters[3]
+        self.dropped += counters[4]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """중복 제거 통계"""
+        hits = self.reply_hits + self.inflight_hits + self.ack_hits
+        return {
+            "lookups": self.lookups,
+            "hits": hits,
+            "reply_hits": self.reply_hits,
+            "inflight_hits": self.inflight_hits,
+            "ack_hits": self.ack_hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "dropped": self.dropped,
+            "entries": sum(len(g) for g in self.generations),
+            "window_seconds": settings.DEDUPE_WINDOW_SECONDS
+        }
+
+# 전역 중복 제거 인스턴스
+delivery_deduper = DeliveryDeduper()
\ No newline at end of file
@@ -0,0 +1,344 @@
+"""
+OpenAI API 키 풀
+키별 레이트 리밋 응답 헤더(x-ratelimit-*)로 남은 요청/토큰 한도를 추적하여
+여유가 가장 많은 키로 요청을 분산하고, 한도 직전에는 초기화 시각까지 속도를 조절하며
+429를 받은 키는 잠시 순환에서 제외 (인증 실패/할당량 소진 키는 기다리지 않고 건너뛰며, 모두 그렇다면 즉시 실패)
+"""
+
+from openai import AsyncOpenAI, AuthenticationError, PermissionDeniedError, RateLimitError
+from loguru import logger
+from typing import Dict, List, Optional, Any
+import asyncio
+import re
+import time
+
+from app.core.config import settings
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """초기화까지 남은 시간 ("1s", "6m0s", "20ms", "1h2m3.5s") -> 초"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        value = headers.get(name)
+        return int(float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class NoUsableKeyError(RuntimeError):
+    """모든 키가 인증 실패/할당량 소진으로 제외된 경우 (기다려도 풀리지 않으므로 즉시 실패)"""
+
+def mask_key(api_key: str) -> str:
+    return f"{api_key[:3]}…{api_key[-4:]}" if len(api_key) > 8 else "…"
+
+class APIKeyState:
+    """키 하나의 클라이언트와 한도 상태"""
+
+    def __init__(self, api_key: str):
+        self.id = mask_key(api_key)
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=settings.OPENAI_BASE_URL or None,
+            timeout=settings.OPENAI_TIMEOUT,
+            max_retries=0
+        )
+        # 헤더를 받기 전까지는 한도를 모름 (None)
+        self.limit_requests: Optional[int] = None
+        self.remaining_requests: Optional[int] = None
+        self.reset_requests_at = 0.0
+        self.limit_tokens: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.reset_tokens_at = 0.0
+        self.cooldown_until = 0.0
+        # 인증 실패/할당량 소진 (한도 초기화와 달리 기다려도 풀리지 않음)
+        self.disabled_until = 0.0
+        # 첫 응답을 받았는지 (한도 헤더를 보내지 않는 엔드포인트도 이후에는 동시 요청 허용)
+        self.probed = False
+        self.inflight = 0
+        self.inflight_tokens = 0
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.tokens_used = 0
+        self.last_error: Optional[str] = None
+
+    def refresh(self, now: float):
+        """초기화 시각이 지난 한도 복원"""
+        if self.limit_requests is not None and now >= self.reset_requests_at:
+            self.remaining_requests = self.limit_requests
+        if self.limit_tokens is not None and now >= self.reset_tokens_at:
+            self.remaining_tokens = self.limit_tokens
+
+    def _requests_short(self) -> bool:
+        if self.remaining_requests is None or self.limit_requests is None:
+            return False
+        return self.remaining_requests <= self.limit_requests * settings.OPENAI_KEY_RESERVE_RATIO
+
+    def _tokens_short(self, tokens: int) -> bool:
+        if self.remaining_tokens is None or self.limit_tokens is None:
+            return False
+        return self.remaining_tokens - tokens < self.limit_tokens * settings.OPENAI_KEY_RESERVE_RATIO
+
+    def available_at(self, now: float, tokens: int) -> float:
+        """이 요청을 보낼 수 있게 되는 시각 (지금 가능하면 now)"""
+        ready = max(now, self.cooldown_until, self.disabled_until)
+        # 첫 응답(한도 헤더)을 받기 전에는 키당 한 번에 하나씩만 (다른 요청 완료 시 다시 확인)
+        if not self.probed and self.inflight > 0:
+            return float("inf")
+        if self._requests_short():
+            ready = max(ready, self.reset_requests_at)
+        if self._tokens_short(tokens):
+            ready = max(ready, self.reset_tokens_at)
+        return ready
+
+    def disabled(self, now: float) -> bool:
+        return now < self.disabled_until
+
+    def headroom(self) -> float:
+        """남은 한도 비율 (요청/토큰 중 작은 값, 모르면 1.0)"""
+        ratios = [1.0]
+        if self.limit_requests:
+            ratios.append(self.remaining_requests / self.limit_requests)
+        if self.limit_tokens:
+            ratios.append(self.remaining_tokens / self.limit_tokens)
+        return min(ratios)
+
+    def take(self, tokens: int):
+        """응답 헤더가 오기 전까지 로컬에서 한도 차감"""
+        self.inflight += 1
+        self.inflight_tokens += tokens
+        self.calls += 1
+        if self.remaining_requests is not None:
+            self.remaining_requests = max(0, self.remaining_requests - 1)
+        if self.remaining_tokens is not None:
+            self.remaining_tokens = max(0, self.remaining_tokens - tokens)
+
+    def apply_headers(self, headers, now: float):
+        """응답 헤더의 한도 정보 반영 (아직 진행 중인 다른 요청 몫은 다시 차감)"""
+        limit_requests = _header_int(headers, "x-ratelimit-limit-requests")
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        if limit_requests is not None and remaining_requests is not None:
+            self.limit_requests = limit_requests
+            self.remaining_requests = max(0, remaining_requests - self.inflight)
+            self.reset_requests_at = now + (parse_reset(headers.get("x-ratelimit-reset-requests")) or 0.0)
+
+        limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        if limit_tokens is not None and remaining_tokens is not None:
+            self.limit_tokens = limit_tokens
+            self.remaining_tokens = max(0, remaining_tokens - self.inflight_tokens)
+            self.reset_tokens_at = now + (parse_reset(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        self.refresh(now)
+        return {
+            "key": self.id,
+            "available": now >= max(self.cooldown_until, self.disabled_until),
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+            "disabled_remaining": round(max(0.0, self.disabled_until - now), 1),
+            "inflight": self.inflight,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "tokens_used": self.tokens_used,
+            "requests": {
+                "limit": self.limit_requests,
+                "remaining": self.remaining_requests,
+                "utilization": round(1 - self.remaining_requests / self.limit_requests, 4) if self.limit_requests else None,
+                "reset_in": round(max(0.0, self.reset_requests_at - now), 2) if self.limit_requests else None
+            },
+            "tokens": {
+                "limit": self.limit_tokens,
+                "remaining": self.remaining_tokens,
+                "utilization": round(1 - self.remaining_tokens / self.limit_tokens, 4) if self.limit_tokens else None,
+                "reset_in": round(max(0.0, self.reset_tokens_at - now), 2) if self.limit_tokens else None
+            },
+            "last_error": self.last_error
+        }
+
+class APIKeyPool:
+    """키 선택, 속도 조절, 429 쿨다운"""
+
+    def __init__(self):
+        self.keys: List[APIKeyState] = []
+        self.paced = 0
+        self.paced_seconds = 0.0
+        self.forced = 0
+        self.rejected = 0
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def configure(self, api_keys: List[str]) -> int:
+        """키 목록으로 풀 재구성 (중복/빈 값 제외)"""
+        unique = list(dict.fromkeys(key.strip() for key in api_keys if key and key.strip()))
+        self.keys = [APIKeyState(key) for key in unique]
+        return len(self.keys)
+
+    @property
+    def primary_client(self) -> Optional[AsyncOpenAI]:
+        return self.keys[0].client if self.keys else None
+
+    def has_available(self, exclude: Optional[APIKeyState] = None) -> bool:
+        now = time.monotonic()
+        return any(key is not exclude and key.available_at(now, 0) <= now for key in self.keys)
+
+    def _pick(self, now: float, tokens: int) -> Optional[APIKeyState]:
+        best = None
+        for key in self.keys:
+            key.refresh(now)
+            if key.available_at(now, tokens) > now:
+                continue
+            if best is None or (key.headroom(), -key.inflight) > (best.headroom(), -best.inflight):
+                best = key
+        return best
+
+    async def acquire(self, tokens: int) -> APIKeyState:
+        """요청을 보낼 키 선택
+
+        모든 키가 한도에 가까우면 OPENAI_KEY_MAX_WAIT 안에 풀리는 경우에만 대기하고,
+        그보다 늦게 풀리면 기다리지 않고 가장 먼저 풀리는 키로 보냅니다.
+        모든 키가 인증 실패/할당량 소진으로 제외되어 있으면 NoUsableKeyError로 즉시 실패합니다.
+        """
+        if not self.keys:
+            raise RuntimeError("사용 가능한 OpenAI API 키가 없습니다.")
+        started = time.monotonic()
+        deadline = started + settings.OPENAI_KEY_MAX_WAIT
+        waited = False
+        while True:
+            now = time.monotonic()
+            key = self._pick(now, tokens)
+            ready_at = now
+            if key is None:
+                usable = [k for k in self.keys if not k.disabled(now)]
+                if not usable:
+                    self.rejected += 1
+                    retry_in = min(k.disabled_until for k in self.keys) - now
+                    raise NoUsableKeyError(
+                        f"모든 OpenAI API 키가 인증 실패/할당량 소진으로 제외되었습니다 ({retry_in:.0f}초 후 재시도)"
+                    )
+                ready_at = min(k.available_at(now, tokens) for k in usable)
+                # 첫 응답을 기다리는 키(inf)는 다른 요청 완료 시 깨어나므로 마감까지 대기
+                if now >= deadline or deadline < ready_at < float("inf"):
+                    # 마감 안에 한도가 풀리지 않으면 가장 먼저 풀리는 키로 전송 (판단은 제공자에 맡김)
+                    key = min(usable, key=lambda k: (k.available_at(now, tokens), k.inflight))
+                    self.forced += 1
+            if key is not None:
+                if waited:
+                    self.paced_seconds += now - started
+                key.take(tokens)
+                return key
+            if not waited:
+                waited = True
+                self.paced += 1
+            await self._wait(min(ready_at, deadline) - now)
+
+    def try_acquire(self, tokens: int) -> Optional[APIKeyState]:
+        """대기 없이 지금 보낼 수 있는 키 선택 (없으면 None, 건너뛰어도 되는 섀도 호출용)"""
+        key = self._pick(time.monotonic(), tokens)
+        if key is not None:
+            key.take(tokens)
+        return key
+
+    async def _wait(self, timeout: float):
+        """초기화 시각 또는 다른 요청 완료까지 대기"""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+            self._wakeup = None
+
+    def release(
+        self,
+        key: APIKeyState,
+        tokens: int,
+        headers=None,
+        used_tokens: int = 0,
+        error: Optional[Exception] = None,
+        cancelled: bool = False
+    ):
+        """요청 완료 후 한도/쿨다운 갱신
+
+        cancelled=True이면 진행 중 수만 되돌립니다 (응답을 받지 못했으므로 첫 응답 확인 상태는 그대로).
+        """
+        now = time.monotonic()
+        key.inflight = max(0, key.inflight - 1)
+        key.inflight_tokens = max(0, key.inflight_tokens - tokens)
+        if cancelled:
+            self._notify()
+            return
+        key.tokens_used += used_tokens
+
+        response = getattr(error, "response", None)
+        if headers is None and response is not None:
+            headers = response.headers
+        if headers is not None:
+            key.apply_headers(headers, now)
+        if error is None or response is not None:
+            key.probed = True
+        self._notify()
+
+        if error is None:
+            return
+        key.last_error = type(error).__name__
+        if isinstance(error, RateLimitError):
+            key.throttled += 1
+            if getattr(error, "code", None) == "insufficient_quota":
+                key.disabled_until = now + settings.OPENAI_KEY_QUOTA_COOLDOWN_SECONDS
+                logger.error(f"OpenAI 키 {key.id} 할당량 소진 - {settings.OPENAI_KEY_QUOTA_COOLDOWN_SECONDS:.0f}초 동안 순환에서 제외")
+            else:
+                cooldown = self._retry_after(headers) or settings.OPENAI_KEY_COOLDOWN_SECONDS
+                key.cooldown_until = max(key.cooldown_until, now + cooldown)
+                logger.warning(f"OpenAI 키 {key.id} 한도 초과 - {cooldown:.1f}초 동안 순환에서 제외")
+        elif isinstance(error, (AuthenticationError, PermissionDeniedError)):
+            key.errors += 1
+            key.disabled_until = now + settings.OPENAI_KEY_QUOTA_COOLDOWN_SECONDS
+            logger.error(f"OpenAI 키 {key.id} 인증 실패 - 순환에서 제외")
+        else:
+            key.errors += 1
+
+    @staticmethod
+    def _retry_after(headers) -> Optional[float]:
+        if headers is None:
+            return None
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        return (
+            parse_reset(headers.get("retry-after"))
+            or parse_reset(headers.get("x-ratelimit-reset-requests"))
+            or parse_reset(headers.get("x-ratelimit-reset-tokens"))
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """키별 사용률"""
+        now = time.monotonic()
+        return {
+            "keys": [key.snapshot(now) for key in self.keys],
+            "available": sum(1 for key in self.keys if key.available_at(now, 0) <= now),
+            "paced_requests": self.paced,
+            "paced_seconds": round(self.paced_seconds, 2),
+            "forced_requests": self.forced,
+            "rejected_no_usable_key": self.rejected,
+            "reserve_ratio": settings.OPENAI_KEY_RESERVE_RATIO,
+            "max_wait": settings.OPENAI_KEY_MAX_WAIT
+        }
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+지연 시간 기반 모델 라우터
+요청별로 입력 길이, 요약 줄 수, 모델별 최근 지연 시간(EWMA)/오류율을 보고
+모델과 max_tokens를 결정
+"""
+
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any
+import time
+
+from app.core.config import settings
+
+@dataclass
+class ModelStats:
+    """모델별 관측 통계"""
+    ewma_latency: Optional[float] = None  # 초
+    ewma_error_rate: float = 0.0
+    calls: int = 0
+    errors: int = 0
+    last_latency: Optional[float] = None
+    last_error_at: Optional[float] = None
+    last_probe_at: Optional[float] = None
+
+@dataclass
+class RoutingDecision:
+    """라우팅 결정 결과"""
+    model: str
+    max_tokens: int
+    reason: str
+    input_chars: int
+    lines: int
+    timestamp: float
+
+class ModelRouter:
+    """요청별 모델 선택기"""
+
+    def __init__(self):
+        self.stats: Dict[str, ModelStats] = {}
+        self.decisions: deque = deque(maxlen=100)
+        self.choice_counts: Dict[str, int] = {}
+
+    def candidates(self) -> List[str]:
+        """라우팅 후보 모델 목록 (기본 모델이 항상 첫 번째)"""
+        models = [settings.OPENAI_MODEL]
+        for model in settings.OPENAI_ROUTING_MODELS:
+            if model not in models:
+                models.append(model)
+        return models
+
+    def max_tokens_for(self, lines: int) -> int:
+        """요청한 줄 수에 맞는 max_tokens 계산 (OPENAI_MAX_TOKENS 상한)"""
+        estimate = lines * settings.OPENAI_TOKENS_PER_LINE + settings.OPENAI_MAX_TOKENS_HEADROOM
+        return max(1, min(settings.OPENAI_MAX_TOKENS, estimate))
+
+    def _score(self, model: str) -> float:
+        """낮을수록 좋은 점수 (관측 기록이 없는 모델은 우선 시도)"""
+        stats = self.stats.get(model)
+        if stats is None or stats.ewma_latency is None:
+            return 0.0
+        return stats.ewma_latency * (1 + settings.OPENAI_ROUTING_ERROR_PENALTY * stats.ewma_error_rate)
+
+    def _is_healthy(self, model: str) -> bool:
+        stats = self.stats.get(model)
+        return stats is None or stats.ewma_error_rate < settings.OPENAI_ROUTING_MAX_ERROR_RATE
+
+    def _recovery_probe(self, candidates: List[str], now: float) -> Optional[str]:
+        """제외된 모델 중 마지막 오류/시험 호출 후 OPENAI_ROUTING_PROBE_INTERVAL이 지난 모델
+
+        오류율 EWMA는 호출될 때만 갱신되므로, 제외된 모델에 주기적으로 요청 하나를 보내 회복 여부를 확인합니다.
+        """
+        interval = settings.OPENAI_ROUTING_PROBE_INTERVAL
+        for model in candidates:
+            if self._is_healthy(model):
+                continue
+            stats = self.stats[model]
+            last_attempt = max(stats.last_error_at or 0.0, stats.last_probe_at or 0.0)
+            if now - last_attempt >= interval:
+                stats.last_probe_at = now
+                return model
+        return None
+
+    def choose(self, input_chars: int, lines: int) -> RoutingDecision:
+        """요청에 사용할 모델과 max_tokens 결정"""
+        primary = settings.OPENAI_MODEL
+        candidates = self.candidates()
+        max_tokens = self.max_tokens_for(lines)
+        now = time.time()
+
+        if not settings.OPENAI_ROUTING_ENABLED or len(candidates) == 1:
+            model, reason = primary, "default"
+        elif (probe := self._recovery_probe(candidates, now)) is not None:
+            model, reason = probe, "recovery_probe"
+        else:
+            healthy = [m for m in candidates if self._is_healthy(m)]
+            if not healthy:
+                # 모두 불안정하면 오류율이 가장 낮은 모델
+                model = min(candidates, key=lambda m: self.stats[m].ewma_error_rate)
+                reason = "all_degraded"
+            elif input_chars <= settings.OPENAI_ROUTING_SHORT_INPUT_CHARS:
+                model = min(healthy, key=self._score)
+                reason = "short_input_fastest"
+            elif primary in healthy:
+                model, reason = primary, "long_input_primary"
+            else:
+                model = min(healthy, key=self._score)
+                reason = "primary_degraded"
+
+        decision = RoutingDecision(
+            model=model,
+            max_tokens=max_tokens,
+            reason=reason,
+            input_chars=input_chars,
+            lines=lines,
+            timestamp=now
+        )
+        self.decisions.append(decision)
+        self.choice_counts[model] = self.choice_counts.get(model, 0) + 1
+        return decision
+
+    def record(self, model: str, latency: float, success: bool):
+        """호출 결과를 EWMA 통계에 반영"""
+        alpha = settings.OPENAI_ROUTING_EWMA_ALPHA
+        stats = self.stats.setdefault(model, ModelStats())
+        stats.calls += 1
+        error = 0.0 if success else 1.0
+        stats.ewma_error_rate = alpha * error + (1 - alpha) * stats.ewma_error_rate
+        if success:
+            stats.last_latency = latency
+            if stats.ewma_latency is None:
+                stats.ewma_latency = latency
+            else:
+                stats.ewma_latency = alpha * latency + (1 - alpha) * stats.ewma_latency
+        else:
+            stats.errors += 1
+            stats.last_error_at = time.time()
+
+    def export_state(self) -> Dict[str, Any]:
+        """웜 스타트 스냅샷용 상태 (모델별 EWMA 통계)"""
+        return {
+            "stats": {model: asdict(stats) for model, stats in self.stats.items()},
+            "choice_counts": dict(self.choice_counts)
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """재시작 전 지연 시간/오류율 추정치 복원 (재시작 후 이미 관측한 모델은 유지)"""
+        for model, data in state.get("stats", {}).items():
+            if model not in self.stats:
+                self.stats[model] = ModelStats(**data)
+        for model, count in state.get("choice_counts", {}).items():
+            self.choice_counts[model] = self.choice_counts.get(model, 0) + count
+
+    def snapshot(self, decision_limit: int = 20) -> Dict[str, Any]:
+        """라우터 상태 및 최근 결정"""
+        return {
+            "enabled": settings.OPENAI_ROUTING_ENABLED,
+            "candidates": self.candidates(),
+            "models": {
+                model: {**asdict(stats), "score": round(self._score(model), 4), "healthy": self._is_healthy(model)}
+                for model, stats in self.stats.items()
+            },
+            "choice_counts": self.choice_counts,
+            "recent_decisions": [asdict(d) for d in list(self.decisions)[-decision_limit:]]
+        }
+
+# 전역 라우터 인스턴스
+model_router = ModelRouter()
\ No newline at end of file
@@ -0,0 +1,449 @@
+"""
+MQTT 작업 분산
+웹훅을 받은 프런트엔드가 작업을 MQTT 토픽에 발행하면 공유 구독($share)으로 묶인 워커 프로세스들이
+나눠 받아 OpenAI를 호출하고, 상관 ID(id)를 붙여 프런트엔드 전용 응답 토픽으로 결과를 돌려줍니다.
+MQTT_HOST="local"이면 프로세스 내 브로커와 내장 워커로 같은 경로를 시험할 수 있습니다.
+"""
+
+from loguru import logger
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any
+import asyncio
+import json
+import secrets
+import socket
+import time
+
+from app.core.config import settings
+from app.models.message import MessageSummaryRequest
+from app.services.openai_service import openai_service
+from app.services.usage_ledger import usage_ledger
+
+class MQTTJobError(Exception):
+    """워커가 작업 처리 실패를 응답한 경우"""
+
+def jobs_topic() -> str:
+    return f"{settings.MQTT_TOPIC_PREFIX}/jobs"
+
+def shared_jobs_topic() -> str:
+    return f"$share/{settings.MQTT_SHARE_GROUP}/{jobs_topic()}"
+
+def reply_topic(node_id: str) -> str:
+    return f"{settings.MQTT_TOPIC_PREFIX}/replies/{node_id}"
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """MQTT 토픽 필터(+, # 와일드카드) 일치 여부"""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels) or (level != "+" and level != topic_levels[index]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+def _split_shared(topic_filter: str) -> Tuple[Optional[str], str]:
+    """$share/<그룹>/<필터> -> (그룹, 필터)"""
+    if topic_filter.startswith("$share/"):
+        _, group, rest = topic_filter.split("/", 2)
+        return group, rest
+    return None, topic_filter
+
+class LocalBroker:
+    """프로세스 내 브로커 (공유 구독은 그룹 안에서 라운드 로빈으로 한 구독자에게만 전달)"""
+
+    def __init__(self):
+        # (그룹, 필터, 수신 큐)
+        self._subscriptions: List[Tuple[Optional[str], str, asyncio.Queue]] = []
+        self._round_robin: Dict[Tuple[str, str], int] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def client(self) -> "LocalTransport":
+        return LocalTransport(self)
+
+    def subscribe(self, topic_filter: str, queue: asyncio.Queue):
+        group, topic_filter = _split_shared(topic_filter)
+        self._subscriptions.append((group, topic_filter, queue))
+
+    def unsubscribe_all(self, queue: asyncio.Queue):
+        self._subscriptions = [s for s in self._subscriptions if s[2] is not queue]
+
+    def publish(self, topic: str, payload: bytes):
+        self.published += 1
+        groups: Dict[Tuple[str, str], List[asyncio.Queue]] = {}
+        delivered = False
+        for group, topic_filter, queue in self._subscriptions:
+            if not topic_matches(topic_filter, topic):
+                continue
+            if group is None:
+                queue.put_nowait((topic, payload))
+                delivered = True
+            else:
+                groups.setdefault((group, topic_filter), []).append(queue)
+
+        for key, queues in groups.items():
+            index = self._round_robin.get(key, 0) % len(queues)
+            self._round_robin[key] = index + 1
+            queues[index].put_nowait((topic, payload))
+            delivered = True
+
+        if not delivered:
+            self.dropped += 1
+
+class LocalTransport:
+    """LocalBroker 연결 (MQTTTransport와 같은 인터페이스)"""
+
+    def __init__(self, broker: LocalBroker):
+        self._broker = broker
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        self._broker.unsubscribe_all(self._queue)
+
+    async def subscribe(self, topic_filter: str):
+        self._broker.subscribe(topic_filter, self._queue)
+
+    async def publish(self, topic: str, payload: bytes):
+        self._broker.publish(topic, payload)
+
+    async def messages(self) -> AsyncIterator[Tuple[str, bytes]]:
+        while True:
+            yield await self._queue.get()
+
+class MQTTTransport:
+    """asyncio-mqtt 클라이언트 래퍼 (패키지는 MQTT 모드에서만 import)"""
+
+    def __init__(self, client_id: str):
+        from asyncio_mqtt import Client
+
+        self._client = Client(
+            hostname=settings.MQTT_HOST,
+            port=settings.MQTT_PORT,
+            username=settings.MQTT_USERNAME or None,
+            password=settings.MQTT_PASSWORD or None,
+            client_id=client_id
+        )
+        self._messages_context = None
+        self._messages = None
+
+    async def connect(self):
+        await self._client.connect()
+        # 구독 전에 수신 큐를 열어 두어야 구독 직후 도착한 메시지를 놓치지 않음
+        self._messages_context = self._client.messages()
+        self._messages = await self._messages_context.__aenter__()
+
+    async def disconnect(self):
+        try:
+            if self._messages_context is not None:
+                await self._messages_context.__aexit__(None, None, None)
+            await self._client.disconnect()
+        except Exception:
+            pass
+
+    async def subscribe(self, topic_filter: str):
+        await self._client.subscribe(topic_filter, qos=settings.MQTT_QOS)
+
+    async def publish(self, topic: str, payload: bytes):
+        await self._client.publish(topic, payload=payload, qos=settings.MQTT_QOS)
+
+    async def messages(self) -> AsyncIterator[Tuple[str, bytes]]:
+        async for message in self._messages:
+            yield message.topic.value, message.payload
+
+_local_broker: Optional[LocalBroker] = None
+
+def local_broker() -> LocalBroker:
+    global _local_broker
+    if _local_broker is None:
+        _local_broker = LocalBroker()
+    return _local_broker
+
+def is_local_mode() -> bool:
+    return settings.MQTT_HOST == "local"
+
+def create_transport(client_id: str):
+    """설정에 맞는 전송 계층 생성"""
+    if is_local_mode():
+        return local_broker().client()
+    return MQTTTransport(client_id)
+
+def _encode(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class _ConnectionLoop(ABC):
+    """연결 유지 루프 (끊기면 MQTT_RECONNECT_DELAY 후 재연결)"""
+
+    client_id = ""
+    subscription = ""
+
+    def __init__(self):
+        self._transport = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Event] = None
+        self.connects = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._transport is not None
+
+    def _start_loop(self):
+        if self._task is None or self._task.done():
+            self._connected = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _stop_loop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            transport = create_transport(self.client_id)
+            try:
+                await transport.connect()
+                await transport.subscribe(self.subscription)
+                self._transport = transport
+                self._connected.set()
+                self.connects += 1
+                logger.info(f"📡 MQTT 연결 - {self.client_id}, 구독: {self.subscription}")
+                async for _topic, payload in transport.messages():
+                    await self._on_message(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"MQTT 연결 오류 ({self.client_id}): {e}")
+            finally:
+                self._connected.clear()
+                self._transport = None
+                await transport.disconnect()
+            await asyncio.sleep(settings.MQTT_RECONNECT_DELAY)
+
+    @abstractmethod
+    async def _on_message(self, payload: bytes):
+        """구독 토픽으로 받은 메시지 처리"""
+
+class MQTTWorker(_ConnectionLoop):
+    """공유 구독으로 작업을 받아 처리하고 결과를 응답 토픽에 발행하는 워커"""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        super().__init__()
+        self.client_id = worker_id or f"worker-{socket.gethostname()}-{secrets.token_hex(3)}"
+        self.subscription = shared_jobs_topic()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._jobs: set = set()
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+
+    def start(self):
+        self._slots = asyncio.Semaphore(settings.MQTT_WORKER_CONCURRENCY)
+        self._start_loop()
+
+    async def stop(self):
+        await self._stop_loop()
+        for job in list(self._jobs):
+            job.cancel()
+        await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    async def _on_message(self, payload: bytes):
+        # 동시 처리 수가 가득 차면 다음 작업을 꺼내지 않고 대기
+        await self._slots.acquire()
+        self.received += 1
+        job = asyncio.get_running_loop().create_task(self._handle(payload))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _handle(self, payload: bytes):
+        try:
+            try:
+                job = json.loads(payload)
+            except ValueError:
+                self.failed += 1
+                logger.warning(f"잘못된 MQTT 작업 형식 ({self.client_id})")
+                return
+
+            # 프런트엔드가 이미 응답 대기를 포기한 작업은 OpenAI를 호출하지 않음
+            if job.get("deadline") and job["deadline"] < time.time():
+                self.expired += 1
+                return
+
+            reply: Dict[str, Any] = {"id": job.get("id"), "worker": self.client_id}
+            # 사용량은 워커 원장 대신 응답에 실어 프런트엔드 원장(예산 확인, /admin/usage)에 기록
+            with usage_ledger.capture() as capture, openai_service.trace_model() as trace:
+                try:
+                    reply["result"] = await self.execute(job.get("kind"), job.get("payload") or {})
+                    reply["ok"] = True
+                    self.completed += 1
+                except Exception as e:
+                    logger.error(f"❌ MQTT 작업 처리 실패 ({self.client_id}): {e}")
+                    reply["ok"] = False
+                    reply["error"] = str(e)
+                    self.failed += 1
+            reply["usage"] = capture.records
+            reply["model"] = trace.model
+
+            transport = self._transport
+            if transport is None or not job.get("reply_to"):
+                logger.warning(f"MQTT 작업 결과를 보낼 수 없습니다 - id: {job.get('id')}")
+                return
+            await transport.publish(job["reply_to"], _encode(reply))
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    async def execute(kind: Optional[str], payload: Dict[str, Any]) -> str:
+        """작업 종류별 처리 (프로세스 내 처리와 같은 OpenAI 서비스 경로)"""
+        if kind == "process":
+            return await openai_service.process_message(payload["message"], room=payload.get("room"))
+        if kind == "summarize":
+            request = MessageSummaryRequest(message=payload["message"], lines=payload.get("lines", 3))
+            return await openai_service.summarize_message(request, room=payload.get("room"))
+        raise ValueError(f"알 수 없는 작업 종류: {kind}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.client_id,
+            "connected": self.connected,
+            "received": self.received,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired,
+            "inflight": len(self._jobs)
+        }
+
+class MQTTDispatcher(_ConnectionLoop):
+    """프런트엔드 측 작업 발행기 (응답 토픽을 구독하고 상관 ID로 대기 중인 요청에 결과 전달)"""
+
+    def __init__(self):
+        super().__init__()
+        self.client_id = f"front-{socket.gethostname()}-{secrets.token_hex(3)}"
+        self.subscription = reply_topic(self.client_id)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._local_workers: List[MQTTWorker] = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.late_replies = 0
+        self.total_latency = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.MQTT_ENABLED
+
+    async def start(self):
+        """서버 시작 시 호출 (MQTT_ENABLED일 때만 연결)"""
+        if not self.enabled:
+            return
+        if is_local_mode():
+            for index in range(settings.MQTT_LOCAL_WORKERS):
+                worker = MQTTWorker(f"local-worker-{index + 1}")
+                worker.start()
+                self._local_workers.append(worker)
+        self._start_loop()
+        logger.info(f"MQTT 작업 분산 사용 - 브로커: {settings.MQTT_HOST}, 작업 토픽: {jobs_topic()}")
+
+    async def stop(self):
+        await self._stop_loop()
+        for worker in self._local_workers:
+            await worker.stop()
+        self._local_workers = []
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+    async def _on_message(self, payload: bytes):
+        try:
+            reply = json.loads(payload)
+        except ValueError:
+            return
+        # 시간 초과 후 도착한 응답이라도 워커가 쓴 토큰은 원장에 반영
+        usage_ledger.record_remote(reply.get("usage"))
+        future = self._pending.pop(reply.get("id"), None)
+        if future is None or future.done():
+            self.late_replies += 1
+            return
+        future.set_result(reply)
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """작업을 발행하고 워커의 응답을 기다림 (MQTT_REQUEST_TIMEOUT 초과 시 asyncio.TimeoutError)"""
+        timeout = settings.MQTT_REQUEST_TIMEOUT
+        started = time.time()
+        job_id = secrets.token_hex(8)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[job_id] = future
+        self.submitted += 1
+        try:
+            if self._connected is None:
+                raise RuntimeError("MQTT 작업 분산이 시작되지 않았습니다.")
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            await self._transport.publish(jobs_topic(), _encode({
+                "id": job_id,
+                "kind": kind,
+                "reply_to": self.subscription,
+                "deadline": started + timeout,
+                "payload": payload
+            }))
+            reply = await asyncio.wait_for(future, max(0.0, timeout - (time.time() - started)))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending.pop(job_id, None)
+
+        if not reply.get("ok"):
+            self.failed += 1
+            raise MQTTJobError(reply.get("error") or "워커 처리 실패")
+        self.completed += 1
+        self.total_latency += time.time() - started
+        return reply
+
+    async def process_message(self, message: str, room: Optional[str] = None) -> str:
+        reply = await self.submit("process", {"message": message, "room": room})
+        openai_service.note_model(reply.get("model"))
+        return reply["result"]
+
+    async def summarize_message(self, request: MessageSummaryRequest, room: Optional[str] = None) -> str:
+        reply = await self.submit("summarize", {"message": request.message, "lines": request.lines, "room": room})
+        openai_service.note_model(reply.get("model"))
+        return reply["result"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """작업 분산 상태"""
+        return {
+            "enabled": self.enabled,
+            "broker": "local" if is_local_mode() else f"{settings.MQTT_HOST}:{settings.MQTT_PORT}",
+            "client_id": self.client_id,
+            "connected": self.connected,
+            "connects": self.connects,
+            "last_error": self.last_error,
+            "jobs_topic": jobs_topic(),
+            "shared_subscription": shared_jobs_topic(),
+            "reply_topic": self.subscription,
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "late_replies": self.late_replies,
+            "avg_latency": round(self.total_latency / self.completed, 3) if self.completed else 0.0,
+            "local_workers": [worker.snapshot() for worker in self._local_workers]
+        }
+
+# 전역 작업 분산기 인스턴스
+mqtt_dispatcher = MQTTDispatcher()
\ No newline at end of file
@@ -2,94 +2,300 @@
 OpenAI LLM 서비스
 """
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from loguru import logger
-from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, List, Dict, Tuple
+import asyncio
 import time
 
 from app.core.config import settings
+from app.core import profiling
 from app.models.message import MessageSummaryRequest
+from app.services.usage_ledger import usage_ledger
+from app.services.model_router import model_router
+from app.services.similarity_cache import similarity_cache
+from app.services.prompt_compactor import prompt_compactor, estimate_tokens
+from app.services.key_pool import APIKeyPool
+from app.services.shadow_eval import shadow_evaluator, ShadowSample
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, RetryBudget, backoff_delay, CLOSED
+
+# 재시도할 일시적 오류
+TRANSIENT_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+class ModelTrace:
+    """요청 하나의 응답을 만든 모델 (유사 캐시 재사용이면 캐시된 요약을 만든 모델)"""
+
+    def __init__(self):
+        self.model: Optional[str] = None
+        self.closed = False
+
+# 현재 요청의 모델 추적기 (없으면 기록하지 않음)
+_current_trace: ContextVar[Optional[ModelTrace]] = ContextVar("model_trace", default=None)
 
 class OpenAIService:
     """OpenAI API 서비스 클래스"""
     
+    # 서킷이 열려 있을 때 즉시 반환하는 응답
+    DEGRADED_REPLY = "현재 AI 서비스 응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요."
+    UNAVAILABLE_SUMMARY_REPLY = "OpenAI 서비스를 사용할 수 없습니다. API 키를 확인해주세요."
+    UNAVAILABLE_REPLY = "안녕하세요! 현재 AI 서비스가 일시적으로 사용할 수 없습니다."
+    FAILED_REPLY = "메시지 처리 중 문제가 발생했습니다."
+    
     def __init__(self):
         self.client: Optional[AsyncOpenAI] = None
+        self.breaker = CircuitBreaker("openai")
+        self.retry_budget = RetryBudget()
+        self.key_pool = APIKeyPool()
+        self._background_tasks = set()
         self._initialize_client()
     
     def _initialize_client(self):
-        """OpenAI 클라이언트 초기화"""
-        if settings.OPENAI_API_KEY:
+        """OpenAI 클라이언트 초기화 (OPENAI_API_KEY와 OPENAI_API_KEYS로 키 풀 구성)"""
+        api_keys = [settings.OPENAI_API_KEY] + list(settings.OPENAI_API_KEYS)
+        if any(api_keys):
             try:
-                self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-                logger.info("OpenAI 클라이언트가 초기화되었습니다.")
+                # 재시도는 서킷 브레이커와 함께 직접 처리 (키별 클라이언트는 max_retries=0)
+                count = self.key_pool.configure(api_keys)
+                self.client = self.key_pool.primary_client
+                logger.info(f"OpenAI 클라이언트가 초기화되었습니다. (API 키 {count}개)")
             except Exception as e:
                 logger.error(f"OpenAI 클라이언트 초기화 실패: {e}")
                 self.client = None
         else:
             logger.warning("OpenAI API 키가 설정되지 않았습니다.")
+            self.key_pool.configure([])
             self.client = None
     
+    def is_fallback_reply(self, text: str) -> bool:
+        """실제 요약이 아닌 대체 응답(서비스 불가, 서킷 열림, 오류)인지 확인"""
+        return text in (
+            self.DEGRADED_REPLY,
+            self.UNAVAILABLE_SUMMARY_REPLY,
+            self.UNAVAILABLE_REPLY,
+            self.FAILED_REPLY
+        ) or "오류가 발생했습니다" in text
+    
     def is_available(self) -> bool:
         """OpenAI 서비스 사용 가능 여부 확인"""
         return self.client is not None
     
-    async def summarize_message(self, request: MessageSummaryRequest) -> str:
+    @contextmanager
+    def trace_model(self) -> Iterator[ModelTrace]:
+        """블록 안에서 응답을 만든 모델 추적 (라우팅으로 OPENAI_MODEL과 다를 수 있음)
+
+        블록이 끝난 뒤 완료되는 백그라운드 작업(캐시 검증 등)은 반영하지 않습니다.
+        """
+        trace = ModelTrace()
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.closed = True
+    
+    @staticmethod
+    def note_model(model: Optional[str]):
+        """현재 요청의 응답 모델 기록 (MQTT 응답처럼 다른 프로세스가 알려 준 모델 포함)"""
+        trace = _current_trace.get()
+        if trace is not None and not trace.closed and model:
+            trace.model = model
+    
+    async def summarize_message(self, request: MessageSummaryRequest, room: Optional[str] = None) -> str:
         """메시지를 요약합니다."""
         if not self.is_available():
-            return "OpenAI 서비스를 사용할 수 없습니다. API 키를 확인해주세요."
+            return self.UNAVAILABLE_SUMMARY_REPLY
+        
+        # 최근 요약한 유사 메시지가 있으면 재사용
+        with profiling.stage("cache"):
+            hit = similarity_cache.lookup(request.message, request.lines)
+        if hit is not None:
+            logger.info(f"유사 메시지 요약 재사용 (해밍 거리 {hit.distance})")
+            if similarity_cache.should_verify():
+                self._spawn(self._verify_cached_summary(request, hit.entry.summary, room))
+            self.note_model(hit.entry.model)
+            return hit.entry.summary
         
         try:
-            # 시스템 프롬프트 생성
-            system_prompt = f"""당신은 한국어 메시지를 {request.lines}줄로 간결하게 요약하는 전문가입니다.
-다음 규칙을 따라주세요:
-1. 정확히 {request.lines}줄로 요약하세요.
-2. 핵심 내용만 포함하세요.
-3. 자연스러운 한국어로 작성하세요.
-4. 불필요한 부사나 형용사는 제거하세요.
-5. 중요한 정보는 빠뜨리지 마세요."""
-            
-            # 사용자 프롬프트
-            user_prompt = f"다음 메시지를 {request.lines}줄로 요약해주세요:\n\n{request.message}"
-            
-            # OpenAI API 호출
-            response = await self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=settings.OPENAI_MAX_TOKENS,
-                temperature=settings.OPENAI_TEMPERATURE
-            )
-            
-            summary = response.choices[0].message.content.strip()
+            summary, model = await self._summarize_upstream(request, room)
+            similarity_cache.store(request.message, request.lines, summary, model=model)
+            self.note_model(model)
             logger.info(f"메시지 요약 완료: {len(request.message)} -> {len(summary)} 문자")
             return summary
             
+        except CircuitOpenError:
+            logger.warning("OpenAI 서킷이 열려 있어 요약 요청을 즉시 거부했습니다.")
+            return self.DEGRADED_REPLY
         except Exception as e:
             logger.error(f"메시지 요약 중 오류 발생: {e}")
             return f"요약 처리 중 오류가 발생했습니다: {str(e)}"
     
-    async def process_message(self, message: str) -> str:
+    async def _summarize_upstream(
+        self,
+        request: MessageSummaryRequest,
+        room: Optional[str] = None,
+        mirror: bool = True
+    ) -> Tuple[str, str]:
+        """OpenAI API를 호출하여 (요약, 사용한 모델) 생성 (mirror=False면 섀도 평가에서 제외)"""
+        # 입력 압축 (잡음 제거, 토큰 예산 적용)
+        with profiling.stage("compaction"):
+            compaction = prompt_compactor.compact(request.message)
+        if compaction.saved_tokens > 0:
+            logger.debug(f"프롬프트 압축: {compaction.original_tokens} -> {compaction.compacted_tokens} 토큰 (추정)")
+        
+        # 모델 및 max_tokens 결정
+        decision = model_router.choose(len(compaction.text), request.lines)
+        
+        # OpenAI API 호출 (재시도 대기 포함)
+        messages = prompt_compactor.build_messages(request.lines, compaction.text)
+        # 일부 요청을 후보 모델/프롬프트로 응답 경로 밖에서 다시 실행하여 비교
+        # (호출 전에 결정하여 실패한 요청도 오류율 비교에 포함, 업스트림이 정상일 때만)
+        mirror = mirror and self.breaker.state == CLOSED and shadow_evaluator.should_mirror()
+        try:
+            with profiling.stage("openai"):
+                response, latency = await self._create_completion(
+                    model=decision.model,
+                    messages=messages,
+                    max_tokens=decision.max_tokens,
+                    room=room
+                )
+        except Exception as e:
+            if mirror:
+                primary = ShadowSample(model=decision.model, latency=0.0, error=type(e).__name__)
+                self._spawn(shadow_evaluator.run(self.key_pool, messages, decision.max_tokens, request.lines, primary))
+            raise
+        summary = response.choices[0].message.content.strip()
+        
+        if mirror:
+            usage = response.usage
+            # 재시도/백오프/키 대기를 뺀 성공한 호출 자체의 지연 시간으로 비교
+            primary = ShadowSample(
+                model=decision.model,
+                latency=latency,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                output=summary
+            )
+            self._spawn(shadow_evaluator.run(self.key_pool, messages, decision.max_tokens, request.lines, primary))
+        
+        return summary, decision.model
+    
+    async def _verify_cached_summary(self, request: MessageSummaryRequest, cached_summary: str, room: Optional[str] = None):
+        """재사용한 요약을 새로 생성한 요약과 비교하여 캐시 정밀도 추정"""
+        try:
+            fresh_summary, _ = await self._summarize_upstream(request, room, mirror=False)
+            similarity_cache.record_verification(cached_summary, fresh_summary)
+        except Exception as e:
+            logger.debug(f"유사 캐시 검증 생략: {e}")
+    
+    def _spawn(self, coro):
+        """응답 경로와 무관한 백그라운드 작업 실행"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _create_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        room: Optional[str] = None
+    ):
+        """서킷 브레이커와 지터 백오프 재시도를 적용한 Chat Completions 호출 (키 풀에서 키 선택)
+
+        (응답, 성공한 시도의 지연 시간)을 반환합니다.
+        """
+        self.retry_budget.deposit()
+        attempt = 0
+        # 키 선택 시 토큰 한도 확인용 추정치 (입력 추정 + 최대 출력)
+        estimated_tokens = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+        
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(self.breaker.name)
+            
+            try:
+                key = await self.key_pool.acquire(estimated_tokens)
+            except BaseException:
+                self.breaker.release()
+                raise
+            
+            start_time = time.time()
+            try:
+                raw_response = await key.client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=settings.OPENAI_TEMPERATURE
+                )
+                response = raw_response.parse()
+            except asyncio.CancelledError:
+                self.key_pool.release(key, estimated_tokens, cancelled=True)
+                self.breaker.release()
+                raise
+            except Exception as e:
+                latency = time.time() - start_time
+                self.key_pool.release(key, estimated_tokens, error=e)
+                transient = isinstance(e, TRANSIENT_ERRORS)
+                # 요청 자체의 문제(400 등)나 다른 키로 넘길 수 있는 키별 한도 초과는 업스트림 장애로 보지 않음
+                if transient and not (isinstance(e, RateLimitError) and self.key_pool.has_available(exclude=key)):
+                    self.breaker.record_failure(latency)
+                else:
+                    self.breaker.release()
+                model_router.record(model, latency, success=False)
+                usage_ledger.record(room, model, latency=latency, success=False)
+                
+                if (not transient
+                        or attempt >= settings.OPENAI_MAX_RETRIES
+                        or not self.retry_budget.try_acquire()):
+                    raise
+                
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.warning(f"OpenAI 일시적 오류, {delay:.2f}초 후 재시도 ({attempt}/{settings.OPENAI_MAX_RETRIES}): {e}")
+                await asyncio.sleep(delay)
+                continue
+            
+            # 지연 시간 및 사용량 기록
+            latency = time.time() - start_time
+            usage = response.usage
+            self.key_pool.release(
+                key,
+                estimated_tokens,
+                headers=raw_response.headers,
+                used_tokens=usage.total_tokens if usage else 0
+            )
+            self.breaker.record_success(latency)
+            model_router.record(model, latency, success=True)
+            usage_ledger.record(
+                room,
+                model,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                latency=latency
+            )
+            return response, latency
+    
+    async def process_message(self, message: str, room: Optional[str] = None) -> str:
         """메시지를 처리하고 응답을 생성합니다."""
         if not self.is_available():
-            return "안녕하세요! 현재 AI 서비스가 일시적으로 사용할 수 없습니다."
+            return self.UNAVAILABLE_REPLY
         
         try:
             # 기본적으로 3줄 요약으로 처리
             request = MessageSummaryRequest(message=message, lines=3)
-            summary = await self.summarize_message(request)
+            summary = await self.summarize_message(request, room=room)
             
             # 요약이 성공적이면 반환, 아니면 기본 응답
-            if "오류가 발생했습니다" not in summary:
+            if not self.is_fallback_reply(summary):
                 return f"📝 메시지 요약:\n{summary}"
             else:
                 return summary
                 
         except Exception as e:
             logger.error(f"메시지 처리 중 오류 발생: {e}")
-            return "메시지 처리 중 문제가 발생했습니다."
+            return self.FAILED_REPLY
     
     async def test_connection(self) -> dict:
         """OpenAI 연결 테스트"""
@@ -99,28 +305,53 @@ class OpenAIService:
                 "message": "OpenAI API 키가 설정되지 않았습니다."
             }
         
+        messages = [{"role": "user", "content": "안녕하세요"}]
+        max_tokens = 10
+        estimated_tokens = estimate_tokens(messages[0]["content"]) + max_tokens
+        try:
+            # 실제 요청과 같이 키 풀에서 키를 받아 한도/쿨다운에 반영
+            key = await self.key_pool.acquire(estimated_tokens)
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"OpenAI API 연결 실패: {str(e)}"
+            }
+        
         try:
             start_time = time.time()
             
             # 간단한 테스트 요청
-            response = await self.client.chat.completions.create(
+            raw_response = await key.client.chat.completions.with_raw_response.create(
                 model=settings.OPENAI_MODEL,
-                messages=[{"role": "user", "content": "안녕하세요"}],
-                max_tokens=10
+                messages=messages,
+                max_tokens=max_tokens
             )
+            response = raw_response.parse()
             
             end_time = time.time()
             response_time = round((end_time - start_time) * 1000, 2)  # ms
+            usage = response.usage
+            self.key_pool.release(
+                key,
+                estimated_tokens,
+                headers=raw_response.headers,
+                used_tokens=usage.total_tokens if usage else 0
+            )
             
             return {
                 "success": True,
                 "message": "OpenAI API 연결 성공",
                 "model": settings.OPENAI_MODEL,
+                "key": key.id,
                 "response_time_ms": response_time,
                 "response": response.choices[0].message.content.strip()
             }
             
+        except asyncio.CancelledError:
+            self.key_pool.release(key, estimated_tokens, cancelled=True)
+            raise
         except Exception as e:
+            self.key_pool.release(key, estimated_tokens, error=e)
             return {
                 "success": False,
                 "message": f"OpenAI API 연결 실패: {str(e)}"
@@ -0,0 +1,156 @@
+"""
+프롬프트 압축 단계
+요약 요청 전에 한국어 채팅 메시지의 잡음을 제거하고 입력 토큰을 예산 이내로 줄임
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Any
+import re
+
+from app.core.config import settings
+from app.core.text_normalize import URL_PATTERN, strip_noise, collapse_whitespace
+
+# 모든 요청에 동일한 시스템 프롬프트 (제공자 프롬프트 캐시가 적중하도록 고정 접두어 유지)
+SYSTEM_PROMPT = """당신은 한국어 메시지를 요청받은 줄 수로 간결하게 요약하는 전문가입니다.
+다음 규칙을 따라주세요:
+1. 요청받은 줄 수를 정확히 지키세요.
+2. 핵심 내용만 포함하세요.
+3. 자연스러운 한국어로 작성하세요.
+4. 불필요한 부사나 형용사는 제거하세요.
+5. 중요한 정보는 빠뜨리지 마세요."""
+
+# 요약 줄 수별 사용자 프롬프트 머리말 (MessageSummaryRequest.lines 범위 1~10)
+USER_PROMPT_PREFIXES = {
+    lines: f"다음 메시지를 {lines}줄로 요약해주세요:\n\n"
+    for lines in range(1, 11)
+}
+
+TRUNCATION_MARK = "\n…(중략)…\n"
+
+# 카카오톡 대화 내보내기 형식의 날짜/시각
+_DATE_LINE_PATTERN = re.compile(r"^-*\s*\d{4}년 \d{1,2}월 \d{1,2}일 \S+요일\s*-*$")
+_TIMESTAMP_PATTERN = re.compile(
+    r"\[(오전|오후) \d{1,2}:\d{2}\]\s*"
+    r"|\d{4}\. \d{1,2}\. \d{1,2}\.? (오전|오후) \d{1,2}:\d{2},?\s*"
+)
+_QUOTE_PATTERN = re.compile(r"^\s*(>|답장\s*:|RE:|Re:)")
+
+def estimate_tokens(text: str) -> int:
+    """로컬 토큰 수 추정 (한글/비ASCII 문자는 약 1토큰, ASCII는 약 4자당 1토큰)"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_chars = len(text) - non_ascii
+    return non_ascii + (ascii_chars + 3) // 4
+
+@dataclass
+class CompactionResult:
+    """압축 결과"""
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    truncated: bool
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+class PromptCompactor:
+    """메시지 전처리기"""
+
+    def __init__(self):
+        self.requests = 0
+        self.original_tokens = 0
+        self.compacted_tokens = 0
+        self.truncated = 0
+        self.recent: deque = deque(maxlen=50)
+
+    def normalize(self, text: str) -> str:
+        """잡음 제거(유사 메시지 캐시와 같은 기준), 링크 축약 및 중복 줄 정리"""
+        text = URL_PATTERN.sub(r"[링크:\2]", strip_noise(text))
+
+        lines: List[str] = []
+        seen = set()
+        for line in text.split("\n"):
+            if _QUOTE_PATTERN.match(line) or _DATE_LINE_PATTERN.match(line.strip()):
+                continue
+            line = _TIMESTAMP_PATTERN.sub("", line)
+            line = collapse_whitespace(line)
+            if not line or line in seen:
+                continue
+            seen.add(line)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def truncate(self, text: str, budget: int) -> str:
+        """토큰 예산을 넘으면 앞부분 2/3, 뒷부분 1/3을 남기고 중간을 생략"""
+        tokens = estimate_tokens(text)
+        if tokens <= budget:
+            return text
+        keep_chars = max(1, int(len(text) * budget / tokens) - len(TRUNCATION_MARK))
+        head = keep_chars * 2 // 3
+        tail = keep_chars - head
+        return text[:head].rstrip() + TRUNCATION_MARK + (text[-tail:].lstrip() if tail else "")
+
+    def compact(self, message: str) -> CompactionResult:
+        """메시지를 압축하고 절약한 토큰 수를 기록"""
+        original_tokens = estimate_tokens(message)
+        text = message
+        if settings.PROMPT_COMPACTION_ENABLED:
+            text = self.normalize(message) or message.strip()
+        compacted = self.truncate(text, settings.PROMPT_MAX_INPUT_TOKENS)
+
+        result = CompactionResult(
+            text=compacted,
+            original_tokens=original_tokens,
+            compacted_tokens=estimate_tokens(compacted),
+            truncated=compacted is not text
+        )
+        self.requests += 1
+        self.original_tokens += result.original_tokens
+        self.compacted_tokens += result.compacted_tokens
+        if result.truncated:
+            self.truncated += 1
+        self.recent.append({
+            "original_tokens": result.original_tokens,
+            "compacted_tokens": result.compacted_tokens,
+            "saved_tokens": result.saved_tokens,
+            "truncated": result.truncated
+        })
+        return result
+
+    def build_messages(self, lines: int, text: str) -> List[Dict[str, str]]:
+        """미리 만들어 둔 템플릿으로 Chat Completions 메시지 구성"""
+        prefix = USER_PROMPT_PREFIXES.get(lines) or f"다음 메시지를 {lines}줄로 요약해주세요:\n\n"
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prefix + text}
+        ]
+
+    def export_state(self) -> Dict[str, Any]:
+        """웜 스타트 스냅샷용 누적 통계"""
+        return {"counters": [self.requests, self.original_tokens, self.compacted_tokens, self.truncated]}
+
+    def restore_state(self, state: Dict[str, Any]):
+        counters = state.get("counters") or [0] * 4
+        self.requests += counters[0]
+        self.original_tokens += counters[1]
+        self.compacted_tokens += counters[2]
+        self.truncated += counters[3]
+
+    def snapshot(self, recent_limit: int = 20) -> Dict[str, Any]:
+        """압축 통계"""
+        saved = self.original_tokens - self.compacted_tokens
+        return {
+            "enabled": settings.PROMPT_COMPACTION_ENABLED,
+            "max_input_tokens": settings.PROMPT_MAX_INPUT_TOKENS,
+            "requests": self.requests,
+            "original_tokens": self.original_tokens,
+            "compacted_tokens": self.compacted_tokens,
+            "saved_tokens": saved,
+            "saved_ratio": round(saved / self.original_tokens, 4) if self.original_tokens else 0.0,
+            "truncated": self.truncated,
+            "recent": list(self.recent)[-recent_limit:]
+        }
+
+# 전역 압축기 인스턴스
+prompt_compactor = PromptCompactor()
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+섀도 트래픽 평가
+실제 요약 요청 일부를 후보 모델/프롬프트로 응답 경로 밖에서 한 번 더 실행하여
+지연 시간, 토큰 사용량, 출력 길이, 오류를 현재 설정과 나란히 비교
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from loguru import logger
+from typing import Dict, List, Optional, Any
+import asyncio
+import random
+import time
+
+from app.core.config import settings
+from app.core.stats import percentile
+from app.services.usage_ledger import usage_ledger
+from app.services.prompt_compactor import estimate_tokens
+
+# 섀도 호출 사용량을 원장에 기록할 때의 채팅방 이름 (채팅방 예산과 분리)
+SHADOW_ROOM = "(shadow)"
+
+def _line_count(text: str) -> int:
+    return len([line for line in text.split("\n") if line.strip()])
+
+@dataclass
+class ShadowSample:
+    """한쪽(현재/후보) 호출 결과"""
+    model: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    output: str = ""
+    error: Optional[str] = None
+
+class SideStats:
+    """한쪽 호출 결과 누적"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.output_chars = 0
+        self.lines_matched = 0
+        self.latencies: deque = deque(maxlen=settings.SHADOW_MAX_SAMPLES)
+
+    def add(self, sample: ShadowSample, lines: int):
+        self.calls += 1
+        if sample.error is not None:
+            self.errors += 1
+            return
+        self.prompt_tokens += sample.prompt_tokens
+        self.completion_tokens += sample.completion_tokens
+        self.output_chars += len(sample.output)
+        if _line_count(sample.output) == lines:
+            self.lines_matched += 1
+        self.latencies.append(sample.latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        succeeded = self.calls - self.errors
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(ordered, 50) * 1000, 1),
+                "p90": round(percentile(ordered, 90) * 1000, 1),
+                "p99": round(percentile(ordered, 99) * 1000, 1),
+                "avg": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0
+            },
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / succeeded, 1) if succeeded else 0.0,
+            "avg_completion_tokens": round(self.completion_tokens / succeeded, 1) if succeeded else 0.0,
+            "avg_output_chars": round(self.output_chars / succeeded, 1) if succeeded else 0.0,
+            "line_count_match_rate": round(self.lines_matched / succeeded, 4) if succeeded else 0.0
+        }
+
+class ShadowEvaluator:
+    """후보 모델/프롬프트 섀도 실행 및 비교 집계
+
+    섀도 호출은 재시도, 서킷 브레이커, 모델 라우팅 통계에 반영하지 않으며
+    동시 실행 수가 SHADOW_MAX_CONCURRENCY에 이르거나 키 풀에 바로 쓸 수 있는 키가 없으면 대기하지 않고 건너뜁니다.
+    키 풀을 거치므로 섀도 호출도 키별 한도 차감과 응답 헤더 반영에 포함됩니다.
+    """
+
+    def __init__(self):
+        self.enabled = settings.SHADOW_ENABLED
+        self.sample_rate = settings.SHADOW_SAMPLE_RATE
+        self.candidate_model = settings.SHADOW_MODEL
+        self.candidate_prompt = settings.SHADOW_SYSTEM_PROMPT
+        self.inflight = 0
+        self.skipped = 0
+        self.skipped_no_key = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.primary = SideStats()
+        self.shadow = SideStats()
+        self.pairs = 0
+        self.shadow_faster = 0
+        self.started_at = time.time()
+        self.recent: deque = deque(maxlen=20)
+
+    @property
+    def candidate_label(self) -> str:
+        model = self.candidate_model or "현재 모델"
+        return f"{model} + 후보 프롬프트" if self.candidate_prompt else model
+
+    def configure(
+        self,
+        enabled: Optional[bool] = None,
+        sample_rate: Optional[float] = None,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None
+    ):
+        """설정 변경 (후보가 바뀌면 비교 통계 초기화)"""
+        candidate = (self.candidate_model, self.candidate_prompt)
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        if model is not None:
+            self.candidate_model = model
+        if system_prompt is not None:
+            self.candidate_prompt = system_prompt
+        if (self.candidate_model, self.candidate_prompt) != candidate:
+            self._reset_stats()
+
+    def reset(self):
+        self._reset_stats()
+
+    def should_mirror(self) -> bool:
+        """이번 요청을 섀도 실행할지 결정"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        if self.inflight >= settings.SHADOW_MAX_CONCURRENCY:
+            self.skipped += 1
+            return False
+        return True
+
+    async def run(
+        self,
+        key_pool,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        lines: int,
+        primary: ShadowSample
+    ):
+        """후보 설정으로 같은 요청을 실행하고 현재 결과와 함께 기록 (백그라운드 작업)
+
+        후보 모델이 없으면 현재 요청이 실제로 사용한 모델로 실행하여 프롬프트만 비교합니다.
+        현재 요청이 실패했어도(primary.error) 실행하여 양쪽 오류율을 같은 요청 기준으로 비교합니다.
+        """
+        model = self.candidate_model or primary.model
+        if self.candidate_prompt:
+            messages = [{"role": "system", "content": self.candidate_prompt}] + messages[1:]
+        candidate = (self.candidate_model, self.candidate_prompt)
+
+        # 실제 요청의 한도를 잠식하지 않도록 여유 있는 키가 없으면 기다리지 않고 건너뜀
+        estimated_tokens = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+        key = key_pool.try_acquire(estimated_tokens)
+        if key is None:
+            self.skipped_no_key += 1
+            return
+
+        self.inflight += 1
+        start_time = time.time()
+        try:
+            raw_response = await key.client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=settings.OPENAI_TEMPERATURE
+            )
+            response = raw_response.parse()
+        except asyncio.CancelledError:
+            key_pool.release(key, estimated_tokens, cancelled=True)
+            raise
+        except Exception as e:
+            key_pool.release(key, estimated_tokens, error=e)
+            shadow = ShadowSample(model=model, latency=time.time() - start_time, error=type(e).__name__)
+            logger.debug(f"섀도 호출 실패 ({model}): {e}")
+        else:
+            latency = time.time() - start_time
+            usage = response.usage
+            key_pool.release(
+                key,
+                estimated_tokens,
+                headers=raw_response.headers,
+                used_tokens=usage.total_tokens if usage else 0
+            )
+            shadow = ShadowSample(
+                model=model,
+                latency=latency,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                output=(response.choices[0].message.content or "").strip()
+            )
+        finally:
+            self.inflight -= 1
+
+        # 섀도 비용도 원장에 남기되 채팅방 예산과는 분리
+        usage_ledger.record(
+            SHADOW_ROOM,
+            model,
+            prompt_tokens=shadow.prompt_tokens,
+            completion_tokens=shadow.completion_tokens,
+            latency=shadow.latency,
+            success=shadow.error is None
+        )
+        # 실행 중 후보가 바뀌었으면 이전 후보 결과는 버림
+        if candidate == (self.candidate_model, self.candidate_prompt):
+            self.record(primary, shadow, lines)
+
+    def record(self, primary: ShadowSample, shadow: ShadowSample, lines: int):
+        self.pairs += 1
+        self.primary.add(primary, lines)
+        self.shadow.add(shadow, lines)
+        if primary.error is None and shadow.error is None and shadow.latency < primary.latency:
+            self.shadow_faster += 1
+        self.recent.append({
+            "timestamp": time.time(),
+            "lines": lines,
+            "primary": {
+                "model": primary.model,
+                "latency_ms": round(primary.latency * 1000, 1),
+                "completion_tokens": primary.completion_tokens,
+                "output": primary.output[:200],
+                "error": primary.error
+            },
+            "shadow": {
+                "model": shadow.model,
+                "latency_ms": round(shadow.latency * 1000, 1),
+                "completion_tokens": shadow.completion_tokens,
+                "output": shadow.output[:200],
+                "error": shadow.error
+            }
+        })
+
+    def snapshot(self, recent_limit: int = 5) -> Dict[str, Any]:
+        """현재/후보 비교 보고"""
+        primary = self.primary.snapshot()
+        shadow = self.shadow.snapshot()
+
+        def ratio(a: float, b: float) -> Optional[float]:
+            return round(a / b, 3) if b else None
+
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "candidate": {
+                # None이면 현재 요청이 라우팅된 모델과 같은 모델
+                "model": self.candidate_model or None,
+                "system_prompt": self.candidate_prompt or None
+            },
+            "started_at": self.started_at,
+            "pairs": self.pairs,
+            "inflight": self.inflight,
+            "skipped_saturated": self.skipped,
+            "skipped_no_key": self.skipped_no_key,
+            "primary": primary,
+            "shadow": shadow,
+            "comparison": {
+                "p50_latency_ratio": ratio(shadow["latency_ms"]["p50"], primary["latency_ms"]["p50"]),
+                "p90_latency_ratio": ratio(shadow["latency_ms"]["p90"], primary["latency_ms"]["p90"]),
+                "prompt_tokens_ratio": ratio(shadow["avg_prompt_tokens"], primary["avg_prompt_tokens"]),
+                "completion_tokens_ratio": ratio(shadow["avg_completion_tokens"], primary["avg_completion_tokens"]),
+                "output_chars_ratio": ratio(shadow["avg_output_chars"], primary["avg_output_chars"]),
+                "shadow_faster_rate": ratio(self.shadow_faster, self.pairs),
+                "error_rate_delta": round(shadow["error_rate"] - primary["error_rate"], 4)
+            },
+            "recent": list(self.recent)[-recent_limit:] if recent_limit > 0 else []
+        }
+
+# 전역 섀도 평가기 인스턴스
+shadow_evaluator = ShadowEvaluator()
\ No newline at end of file
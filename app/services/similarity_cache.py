@@ -0,0 +1,286 @@
+"""
+유사 메시지 요약 캐시
+SimHash + LSH 밴드 버킷으로 최근 요약한 메시지와 거의 같은 메시지를 찾아 요약을 재사용
+
+숫자 하나(금액, 시각)가 바뀐 메시지는 3-gram SimHash가 거의 달라지지 않으므로,
+숫자/URL 토큰 서명이 정확히 같을 때만 재사용하고 거리 0은 정규화 결과가 완전히 같을 때로 한정합니다.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Any, Set, Tuple
+import hashlib
+import random
+import re
+import time
+
+from app.core.config import settings
+from app.core.text_normalize import strip_noise, strip_url_tracking, collapse_whitespace
+
+SIMHASH_BITS = 64
+LSH_BANDS = 4
+BAND_BITS = SIMHASH_BITS // LSH_BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+SHINGLE_SIZE = 3
+MAX_TEXT_CHARS = 4000
+
+# 비트별 카운터를 하나의 큰 정수 레인(lane)에 나란히 두고 한 번의 덧셈으로 누적하기 위한 테이블
+_LANE_BITS = 16
+_SPREAD_TABLE = [
+    sum(((byte >> bit) & 1) << (bit * _LANE_BITS) for bit in range(8))
+    for byte in range(256)
+]
+
+_FACT_PATTERN = re.compile(r"https?://\S+|\d+(?:[.,:/-]\d+)*")
+_SIGNATURE_PATTERN = re.compile(r"^\s*[-—~=]+.{0,30}$|^.{0,20}(드림|올림|배상)\s*$")
+
+def normalize_text(text: str) -> str:
+    """비교용 정규화: 공용 잡음 제거(프롬프트 압축과 같은 기준) + 소문자화, 끝 서명 제거"""
+    text = strip_url_tracking(strip_noise(text[:MAX_TEXT_CHARS])).lower()
+    lines = [collapse_whitespace(line) for line in text.split("\n")]
+    lines = [line for line in lines if line]
+    while len(lines) > 1 and _SIGNATURE_PATTERN.match(lines[-1]):
+        lines.pop()
+    return " ".join(lines)
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+def fact_signature(normalized: str) -> str:
+    """숫자/URL 토큰 서명 (순서 포함, 하나라도 다르면 다른 서명)"""
+    return _digest("\x00".join(_FACT_PATTERN.findall(normalized)))
+
+def simhash(text: str) -> int:
+    """문자 3-gram 기반 64비트 SimHash"""
+    if len(text) < SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+    total = 0
+    for shingle in shingles:
+        h = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for i, byte in enumerate(h):
+            total += _SPREAD_TABLE[byte] << (i * 8 * _LANE_BITS)
+
+    threshold = len(shingles) / 2
+    lane_mask = (1 << _LANE_BITS) - 1
+    value = 0
+    for bit in range(SIMHASH_BITS):
+        if (total >> (bit * _LANE_BITS)) & lane_mask > threshold:
+            value |= 1 << bit
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+@dataclass
+class CacheEntry:
+    """캐시된 요약"""
+    fingerprint: int
+    lines: int
+    summary: str
+    created_at: float
+    hits: int = 0
+    model: Optional[str] = None
+    # 정규화 결과 해시 / 숫자·URL 토큰 서명 (없으면 재사용하지 않음)
+    text_digest: str = ""
+    facts: str = ""
+
+@dataclass
+class CacheHit:
+    """조회 결과"""
+    entry: CacheEntry
+    distance: int
+
+class SimilarityCache:
+    """SimHash 유사도 기반 요약 캐시
+
+    64비트 지문을 16비트씩 4개 밴드로 나눠 버킷에 넣으므로,
+    해밍 거리 3 이하인 지문은 적어도 한 밴드가 일치해 후보로 조회됩니다.
+    후보는 숫자/URL 서명이 같아야 하고, 허용 거리가 0이면 정규화 결과가 완전히 같아야 적중합니다.
+    """
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, int, int], Set[int]] = {}
+        self._next_id = 0
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.distance_total = 0
+        self.lookup_time_total = 0.0
+        self.verifications = 0
+        self.verified_matches = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _bands(fingerprint: int):
+        for band in range(LSH_BANDS):
+            yield band, (fingerprint >> (band * BAND_BITS)) & BAND_MASK
+
+    def _max_distance(self, normalized: str) -> int:
+        # 짧은 메시지는 SimHash가 불안정하므로 정규화 결과가 같을 때만 재사용
+        if len(normalized) < settings.SIMILARITY_MIN_CHARS:
+            return 0
+        return min(settings.SIMILARITY_MAX_DISTANCE, LSH_BANDS - 1)
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band, value in self._bands(entry.fingerprint):
+            key = (entry.lines, band, value)
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def _expire(self, now: float):
+        ttl = settings.SIMILARITY_CACHE_TTL
+        while self.entries:
+            entry_id, entry = next(iter(self.entries.items()))
+            if now - entry.created_at < ttl:
+                break
+            self._remove(entry_id)
+
+    def lookup(self, message: str, lines: int) -> Optional[CacheHit]:
+        """유사한 메시지의 요약 조회"""
+        if not settings.SIMILARITY_CACHE_ENABLED:
+            return None
+        started = time.perf_counter()
+        self.lookups += 1
+        self._expire(time.time())
+
+        normalized = normalize_text(message)
+        fingerprint = simhash(normalized)
+        max_distance = self._max_distance(normalized)
+        text_digest = _digest(normalized)
+        facts = fact_signature(normalized)
+
+        best: Optional[Tuple[int, int]] = None
+        seen: Set[int] = set()
+        for band, value in self._bands(fingerprint):
+            for entry_id in self.buckets.get((lines, band, value), ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                entry = self.entries[entry_id]
+                distance = hamming_distance(fingerprint, entry.fingerprint)
+                if distance > max_distance or (best is not None and distance >= best[1]):
+                    continue
+                # 지문이 가까워도 숫자/URL이 다르거나, 거리 0인데 내용이 다르면 다른 메시지
+                if entry.facts != facts or (max_distance == 0 and entry.text_digest != text_digest):
+                    self.rejected += 1
+                    continue
+                best = (entry_id, distance)
+
+        self.lookup_time_total += time.perf_counter() - started
+        if best is None:
+            return None
+
+        entry_id, distance = best
+        entry = self.entries[entry_id]
+        entry.hits += 1
+        if distance == 0:
+            self.exact_hits += 1
+        else:
+            self.near_hits += 1
+        self.distance_total += distance
+        return CacheHit(entry=entry, distance=distance)
+
+    def store(self, message: str, lines: int, summary: str, model: Optional[str] = None):
+        """요약 결과 저장 (model: 요약을 만든 모델)"""
+        if not settings.SIMILARITY_CACHE_ENABLED:
+            return
+        normalized = normalize_text(message)
+        self._insert(CacheEntry(
+            fingerprint=simhash(normalized),
+            lines=lines,
+            summary=summary,
+            created_at=time.time(),
+            model=model,
+            text_digest=_digest(normalized),
+            facts=fact_signature(normalized)
+        ))
+
+    def _insert(self, entry: CacheEntry):
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = entry
+        for band, value in self._bands(entry.fingerprint):
+            self.buckets.setdefault((entry.lines, band, value), set()).add(entry_id)
+        while len(self.entries) > settings.SIMILARITY_CACHE_SIZE:
+            self._remove(next(iter(self.entries)))
+
+    def should_verify(self) -> bool:
+        """적중 결과를 실제 요약과 비교 검증할지 표본 추출"""
+        return settings.SIMILARITY_VERIFY_RATE > 0 and random.random() < settings.SIMILARITY_VERIFY_RATE
+
+    def record_verification(self, cached_summary: str, fresh_summary: str):
+        """재사용한 요약과 새로 생성한 요약이 유사한지 기록 (정밀도 추정용)"""
+        self.verifications += 1
+        distance = hamming_distance(
+            simhash(normalize_text(cached_summary)),
+            simhash(normalize_text(fresh_summary))
+        )
+        if distance <= settings.SIMILARITY_VERIFY_MAX_DISTANCE:
+            self.verified_matches += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.buckets.clear()
+
+    def export_state(self) -> Dict[str, Any]:
+        """웜 스타트 스냅샷용 상태 (만료되지 않은 항목과 누적 통계)"""
+        self._expire(time.time())
+        return {
+            "entries": [
+                [entry.fingerprint, entry.lines, entry.summary, entry.created_at, entry.hits, entry.model,
+                 entry.text_digest, entry.facts]
+                for entry in self.entries.values()
+            ],
+            "counters": [self.lookups, self.exact_hits, self.near_hits, self.distance_total,
+                         self.verifications, self.verified_matches]
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """스냅샷 항목을 현재 항목과 합쳐 생성 시각 순으로 다시 색인"""
+        restored = [CacheEntry(*item) for item in state.get("entries", [])]
+        entries = sorted(restored + list(self.entries.values()), key=lambda entry: entry.created_at)
+        self.clear()
+        for entry in entries:
+            self._insert(entry)
+        self._expire(time.time())
+        counters = state.get("counters") or [0] * 6
+        self.lookups += counters[0]
+        self.exact_hits += counters[1]
+        self.near_hits += counters[2]
+        self.distance_total += counters[3]
+        self.verifications += counters[4]
+        self.verified_matches += counters[5]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """캐시 통계"""
+        hits = self.exact_hits + self.near_hits
+        return {
+            "enabled": settings.SIMILARITY_CACHE_ENABLED,
+            "size": len(self.entries),
+            "capacity": settings.SIMILARITY_CACHE_SIZE,
+            "max_distance": settings.SIMILARITY_MAX_DISTANCE,
+            "lookups": self.lookups,
+            "hits": hits,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "rejected_candidates": self.rejected,
+            "avg_hit_distance": round(self.distance_total / hits, 2) if hits else 0.0,
+            "avg_lookup_us": round(self.lookup_time_total / self.lookups * 1e6, 1) if self.lookups else 0.0,
+            "verify_rate": settings.SIMILARITY_VERIFY_RATE,
+            "verifications": self.verifications,
+            "precision": round(self.verified_matches / self.verifications, 4) if self.verifications else None
+        }
+
+# 전역 유사도 캐시 인스턴스
+similarity_cache = SimilarityCache()
\ No newline at end of file
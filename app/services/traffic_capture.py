@@ -0,0 +1,183 @@
+"""
+웹훅 트래픽 수집
+/webhook/message, /webhook/summary 요청을 도착 시각과 함께 압축 파일로 기록 (replay_traffic.py로 재생)
+"""
+
+from loguru import logger
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+import asyncio
+import gzip
+import hashlib
+import json
+import re
+import secrets
+import time
+import unicodedata
+
+from app.core.config import settings
+
+# 가명 처리할 식별자 필드
+
+# anonymize 설정이 켜져 있을 때의 실제 처리 방식 (수집 파일은 여전히 민감한 대화 데이터로 취급)
+PRIVACY_MODE = "pseudonymized"
+IDENTIFIER_FIELDS = ("room", "sender")
+
+_WHITESPACE_SPLIT = re.compile(r"(\s+)")
+
+def anonymize_identifier(value: str, salt: str) -> str:
+    """같은 값은 같은 가명으로 바꿔 방/발신자 단위의 트래픽 모양을 유지"""
+    return hashlib.blake2b(f"{salt}{value}".encode("utf-8"), digest_size=5).hexdigest()
+
+def _pseudonym_token(token: str, salt: str) -> str:
+    """토큰 하나를 같은 길이/문자 종류의 가명으로 (같은 토큰은 항상 같은 가명)"""
+    stream = hashlib.shake_256(f"{salt}{token}".encode("utf-8")).digest(2 * len(token))
+    chars = []
+    for i, ch in enumerate(token):
+        value = int.from_bytes(stream[2 * i:2 * i + 2], "little")
+        if "가" <= ch <= "힣":
+            chars.append(chr(0xAC00 + value % 11172))
+        elif ch.isdigit():
+            chars.append(str(value % 10))
+        elif ch.isascii() and ch.isalpha():
+            chars.append(chr((ord("A") if ch.isupper() else ord("a")) + value % 26))
+        elif unicodedata.category(ch).startswith("P"):
+            chars.append(ch)
+        else:
+            chars.append("*")
+    return "".join(chars)
+
+def anonymize_text(text: str, salt: str) -> str:
+    """단어 단위 가명 처리 (길이, 공백, 문자 종류, 반복 여부는 유지하고 내용은 제거)
+
+    같은 단어는 같은 가명으로 바뀌므로 재생 시 서로 다른 메시지가 요약 캐시/중복 제거에서
+    하나로 합쳐지지 않고, 실제로 반복된 메시지는 그대로 반복됩니다.
+    익명화가 아닌 가명화입니다: 수집 하나 안에서는 치환이 고정되어 단어 길이/문장 부호/빈도가 남으므로
+    자주 쓰는 단어는 빈도 분석으로 복원될 수 있습니다.
+    """
+    return "".join(
+        part if not part or part.isspace() else _pseudonym_token(part, salt)
+        for part in _WHITESPACE_SPLIT.split(text)
+    )
+
+class TrafficCapture:
+    """옵트인 방식의 요청 기록기"""
+
+    def __init__(self):
+        self.enabled = settings.TRAFFIC_CAPTURE_ENABLED
+        self.anonymize = settings.TRAFFIC_CAPTURE_ANONYMIZE
+        self._salt = secrets.token_hex(8)
+        self._buffer: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._pending: set = set()
+        self.recorded = 0
+        self.started_at: Optional[float] = time.time() if self.enabled else None
+
+    def record(self, path: str, body: Dict[str, Any]):
+        """요청 하나를 버퍼에 기록 (파일 쓰기는 백그라운드에서)"""
+        if not self.enabled:
+            return
+        if self.anonymize:
+            body = dict(body)
+            for field in IDENTIFIER_FIELDS:
+                if isinstance(body.get(field), str):
+                    body[field] = anonymize_identifier(body[field], self._salt)
+            if isinstance(body.get("message"), str):
+                body["message"] = anonymize_text(body["message"], self._salt)
+        self._buffer.append(json.dumps(
+            {"t": round(time.time(), 4), "p": path, "b": body},
+            ensure_ascii=False,
+            separators=(",", ":")
+        ))
+        self.recorded += 1
+        if len(self._buffer) >= settings.TRAFFIC_CAPTURE_BUFFER_SIZE:
+            self._spawn_flush()
+
+    def start(self, anonymize: Optional[bool] = None):
+        """수집 시작"""
+        if anonymize is not None:
+            self.anonymize = anonymize
+        self._salt = secrets.token_hex(8)
+        self.enabled = True
+        self.started_at = time.time()
+        self.recorded = 0
+        self._ensure_flush_loop()
+        logger.info(f"트래픽 수집 시작 - 파일: {settings.TRAFFIC_CAPTURE_FILE}, 가명 처리: {self.anonymize}")
+
+    async def stop(self):
+        """수집 중지 후 남은 버퍼 기록"""
+        self.enabled = False
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    @staticmethod
+    def _append_lines(path: str, lines: List[str]):
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # gzip 멤버를 이어 붙여도 하나의 스트림으로 읽힘
+        with gzip.open(target, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def flush(self):
+        """버퍼 내용을 파일에 추가"""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            async with self._write_lock:
+                await asyncio.to_thread(self._append_lines, settings.TRAFFIC_CAPTURE_FILE, lines)
+        except Exception as e:
+            logger.error(f"트래픽 수집 파일 기록 실패: {e}")
+
+    def _spawn_flush(self):
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.TRAFFIC_CAPTURE_FLUSH_INTERVAL)
+            await self.flush()
+
+    def _ensure_flush_loop(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    def on_startup(self):
+        """서버 시작 시 (설정으로 활성화된 경우) 주기적 기록 시작"""
+        if self.enabled:
+            self._ensure_flush_loop()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "anonymize": self.anonymize,
+            "privacy": PRIVACY_MODE if self.anonymize else "raw",
+            "sensitive": True,
+            "file": settings.TRAFFIC_CAPTURE_FILE,
+            "started_at": self.started_at,
+            "recorded": self.recorded,
+            "buffered": len(self._buffer)
+        }
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """수집 파일을 도착 시각 순으로 읽기"""
+    records = []
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r["t"])
+    return records
+
+# 전역 트래픽 수집기 인스턴스
+traffic_capture = TrafficCapture()
\ No newline at end of file
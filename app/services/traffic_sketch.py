@@ -0,0 +1,337 @@
+"""
+트래픽 구성 스트리밍 집계
+메시지를 저장하지 않고 고정 메모리 스케치로 채팅방/발신자/반복 메시지의 빈도와 고유 수를 추정
+
+- Count-Min Sketch: 임의 키의 빈도 상한 추정
+- Space-Saving (Stream-Summary): 상위 K개 키와 최대 과대 추정치(error)
+- HyperLogLog: 고유 채팅방/발신자 수
+
+스케치는 SKETCH_SLOT_SECONDS 단위 슬롯에 쌓이고 최근 SKETCH_SLOTS개 슬롯만 유지되며,
+조회 시 원하는 창에 해당하는 슬롯들을 합쳐 슬라이딩 창 통계를 만듭니다.
+"""
+
+from array import array
+from collections import deque
+from typing import Dict, List, Optional, Any, Tuple
+import hashlib
+import math
+import re
+import time
+
+from app.core.config import settings
+
+# 집계 대상 차원
+DIMENSIONS = ("rooms", "senders", "messages")
+# 고유 수를 추정하는 차원
+DISTINCT_DIMENSIONS = ("rooms", "senders")
+
+_WHITESPACE = re.compile(r"\s+")
+_MASK64 = (1 << 64) - 1
+
+def _hash(key: str) -> Tuple[int, int]:
+    """키 -> 독립적인 64비트 해시 두 개 (CMS 이중 해싱과 HLL이 공유)"""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+def message_key(text: str) -> str:
+    """대소문자/공백 차이를 무시한 메시지 지문"""
+    normalized = _WHITESPACE.sub(" ", text).strip().lower()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+class CountMinSketch:
+    """depth x width 카운터 행렬 (추정치 >= 실제 빈도)"""
+
+    __slots__ = ("width", "depth", "rows")
+
+    def __init__(self, width: int, depth: int):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def add(self, hashes: Tuple[int, int], count: int = 1):
+        h1, h2 = hashes
+        width = self.width
+        for i, row in enumerate(self.rows):
+            row[(h1 + i * h2) % width] += count
+
+    def estimate(self, hashes: Tuple[int, int]) -> int:
+        h1, h2 = hashes
+        width = self.width
+        return min(row[(h1 + i * h2) % width] for i, row in enumerate(self.rows))
+
+class _Bucket:
+    """같은 횟수를 가진 카운터 묶음 (횟수 오름차순 연결 리스트)"""
+
+    __slots__ = ("count", "items", "prev", "next")
+
+    def __init__(self, count: int):
+        self.count = count
+        self.items: Dict[str, "_Counter"] = {}
+        self.prev: Optional["_Bucket"] = None
+        self.next: Optional["_Bucket"] = None
+
+class _Counter:
+    __slots__ = ("key", "error", "label", "bucket")
+
+    def __init__(self, key: str, error: int, label: Optional[str]):
+        self.key = key
+        self.error = error
+        self.label = label
+        self.bucket: Optional[_Bucket] = None
+
+class SpaceSaving:
+    """Space-Saving 상위 K 추적 (Stream-Summary 구조로 갱신 O(1))
+
+    추적 중이 아닌 키가 들어오면 가장 적은 횟수의 키를 밀어내고 그 횟수 + 1에서 시작합니다.
+    보고되는 횟수는 실제 이상이며 실제 횟수는 (count - error) 이상입니다.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: Dict[str, _Counter] = {}
+        self.head: Optional[_Bucket] = None  # 최소 횟수 묶음
+
+    @property
+    def min_count(self) -> int:
+        """추적되지 않은 키의 최대 가능 횟수"""
+        if self.head is None or len(self.counters) < self.capacity:
+            return 0
+        return self.head.count
+
+    def add(self, key: str, label: Optional[str] = None):
+        counter = self.counters.get(key)
+        if counter is not None:
+            self._increment(counter)
+            return
+        if len(self.counters) < self.capacity:
+            counter = _Counter(key, 0, label)
+            self.counters[key] = counter
+            if self.head is not None and self.head.count == 1:
+                self._attach(counter, self.head)
+            else:
+                bucket = _Bucket(1)
+                bucket.next = self.head
+                if self.head is not None:
+                    self.head.prev = bucket
+                self.head = bucket
+                self._attach(counter, bucket)
+            return
+        # 최소 횟수 카운터를 새 키로 교체
+        victim = next(iter(self.head.items.values()))
+        del self.counters[victim.key]
+        del self.head.items[victim.key]
+        victim.key = key
+        victim.error = self.head.count
+        victim.label = label
+        self.head.items[key] = victim
+        self.counters[key] = victim
+        self._increment(victim)
+
+    @staticmethod
+    def _attach(counter: _Counter, bucket: _Bucket):
+        bucket.items[counter.key] = counter
+        counter.bucket = bucket
+
+    def _increment(self, counter: _Counter):
+        bucket = counter.bucket
+        target_count = bucket.count + 1
+        target = bucket.next
+        if target is None or target.count != target_count:
+            target = _Bucket(target_count)
+            target.prev = bucket
+            target.next = bucket.next
+            if bucket.next is not None:
+                bucket.next.prev = target
+            bucket.next = target
+        del bucket.items[counter.key]
+        self._attach(counter, target)
+        if not bucket.items:
+            self._unlink(bucket)
+
+    def _unlink(self, bucket: _Bucket):
+        if bucket.prev is not None:
+            bucket.prev.next = bucket.next
+        else:
+            self.head = bucket.next
+        if bucket.next is not None:
+            bucket.next.prev = bucket.prev
+
+    def items(self):
+        """(키, 횟수, 오차, 라벨)"""
+        for counter in self.counters.values():
+            yield counter.key, counter.bucket.count, counter.error, counter.label
+
+class HyperLogLog:
+    """2^precision 레지스터 (표준 오차 약 1.04 / sqrt(2^precision))"""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, hashes: Tuple[int, int]):
+        value = hashes[0]
+        index = value >> (64 - self.precision)
+        rest = (value << self.precision) & _MASK64
+        rank = 64 - self.precision + 1 if rest == 0 else 65 - rest.bit_length()
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    @staticmethod
+    def count_registers(registers: bytes) -> int:
+        m = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # 작은 범위는 선형 계수 (Linear Counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    @staticmethod
+    def union(registers_list: List[bytes]) -> bytes:
+        merged = registers_list[0]
+        for registers in registers_list[1:]:
+            merged = bytes(map(max, merged, registers))
+        return merged
+
+class _Slot:
+    """SKETCH_SLOT_SECONDS 동안의 스케치 묶음"""
+
+    __slots__ = ("start", "messages", "cms", "top", "hll")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.messages = 0
+        self.cms = {name: CountMinSketch(settings.SKETCH_CMS_WIDTH, settings.SKETCH_CMS_DEPTH) for name in DIMENSIONS}
+        self.top = {name: SpaceSaving(settings.SKETCH_TOP_K) for name in DIMENSIONS}
+        self.hll = {name: HyperLogLog(settings.SKETCH_HLL_PRECISION) for name in DISTINCT_DIMENSIONS}
+
+class TrafficSketch:
+    """슬롯 링에 스케치를 쌓고 슬라이딩 창으로 조회"""
+
+    def __init__(self):
+        self.slots: deque = deque(maxlen=settings.SKETCH_SLOTS)
+        self.total_messages = 0
+        self.started_at = time.time()
+
+    def _slot(self, now: float) -> _Slot:
+        start = now - now % settings.SKETCH_SLOT_SECONDS
+        if not self.slots or self.slots[-1].start != start:
+            self.slots.append(_Slot(start))
+        return self.slots[-1]
+
+    def record(self, room: str, sender: str, message: str):
+        """메시지 하나 반영 (내용은 지문과 앞부분 미리보기만 사용)"""
+        if not settings.SKETCH_ENABLED:
+            return
+        slot = self._slot(time.time())
+        slot.messages += 1
+        self.total_messages += 1
+
+        keys = {
+            "rooms": (room, None),
+            "senders": (f"{room}\x00{sender}", None),
+            "messages": (message_key(message), message[:settings.SKETCH_PREVIEW_CHARS])
+        }
+        for name, (key, label) in keys.items():
+            hashes = _hash(key)
+            slot.cms[name].add(hashes)
+            slot.top[name].add(key, label)
+            if name in slot.hll:
+                slot.hll[name].add(hashes)
+
+    def _window(self, seconds: int) -> List[_Slot]:
+        cutoff = time.time() - seconds
+        return [slot for slot in self.slots if slot.start + settings.SKETCH_SLOT_SECONDS > cutoff]
+
+    def estimate(self, dimension: str, key: str, seconds: int) -> int:
+        """창 안의 키 빈도 상한 (슬롯별 추정치의 합, 발신자 키는 "방\x00발신자", 메시지 키는 message_key)"""
+        hashes = _hash(key)
+        return sum(slot.cms[dimension].estimate(hashes) for slot in self._window(seconds))
+
+    def top(self, dimension: str, seconds: int, limit: int) -> List[Dict[str, Any]]:
+        """창 안의 상위 키 (슬롯별 Space-Saving 결과를 합치고 CMS로 상한을 좁힘)"""
+        slots = self._window(seconds)
+        merged: Dict[str, List[Any]] = {}
+        for slot in slots:
+            for key, count, error, label in slot.top[dimension].items():
+                entry = merged.setdefault(key, [0, 0, label])
+                entry[0] += count
+                entry[1] += error
+        # 어떤 슬롯의 상위 목록에 없던 키는 그 슬롯에서 최대 min_count만큼 놓쳤을 수 있음
+        for key, entry in merged.items():
+            for slot in slots:
+                top = slot.top[dimension]
+                if key not in top.counters:
+                    entry[0] += top.min_count
+                    entry[1] += top.min_count
+
+        ranked = sorted(merged.items(), key=lambda item: item[1][0] - item[1][1], reverse=True)[:limit]
+        result = []
+        for key, (count, error, label) in ranked:
+            hashes = _hash(key)
+            upper = min(count, sum(slot.cms[dimension].estimate(hashes) for slot in slots))
+            item = {"count": upper, "guaranteed": max(0, count - error)}
+            if dimension == "senders":
+                item["room"], item["sender"] = key.split("\x00", 1)
+            elif dimension == "messages":
+                item["fingerprint"] = key
+                item["preview"] = label
+            else:
+                item["room"] = key
+            result.append(item)
+        return result
+
+    def distinct(self, dimension: str, seconds: int) -> int:
+        slots = self._window(seconds)
+        if not slots:
+            return 0
+        return HyperLogLog.count_registers(HyperLogLog.union([bytes(slot.hll[dimension].registers) for slot in slots]))
+
+    @property
+    def max_window(self) -> int:
+        return settings.SKETCH_SLOT_SECONDS * settings.SKETCH_SLOTS
+
+    def snapshot(self, seconds: int = 300, limit: int = 10) -> Dict[str, Any]:
+        """창 안의 메시지 수, 고유 채팅방/발신자 수, 상위 채팅방/발신자/반복 메시지"""
+        seconds = max(settings.SKETCH_SLOT_SECONDS, min(seconds, self.max_window))
+        summary = self.summary(seconds)
+        return {
+            "enabled": settings.SKETCH_ENABLED,
+            **summary,
+            "max_window_seconds": self.max_window,
+            "messages_per_minute": round(summary["messages"] / seconds * 60, 2),
+            "top_rooms": self.top("rooms", seconds, limit),
+            "top_senders": self.top("senders", seconds, limit),
+            "repeated_messages": [item for item in self.top("messages", seconds, limit) if item["guaranteed"] > 1],
+            "total_messages": self.total_messages,
+            "started_at": self.started_at,
+            "memory_bytes": self.memory_bytes()
+        }
+
+    def summary(self, seconds: int = 300) -> Dict[str, Any]:
+        """창 안의 메시지 수와 고유 채팅방/발신자 수"""
+        return {
+            "window_seconds": seconds,
+            "messages": sum(slot.messages for slot in self._window(seconds)),
+            "distinct_rooms": self.distinct("rooms", seconds),
+            "distinct_senders": self.distinct("senders", seconds)
+        }
+
+    def memory_bytes(self) -> int:
+        """스케치 카운터가 차지하는 대략적인 메모리 (슬롯 수에 비례, 메시지 수와 무관)"""
+        per_slot = (
+            len(DIMENSIONS) * settings.SKETCH_CMS_WIDTH * settings.SKETCH_CMS_DEPTH * 4
+            + len(DISTINCT_DIMENSIONS) * (1 << settings.SKETCH_HLL_PRECISION)
+        )
+        return per_slot * len(self.slots)
+
+    def reset(self):
+        self.slots.clear()
+        self.total_messages = 0
+        self.started_at = time.time()
+
+# 전역 트래픽 스케치 인스턴스
+traffic_sketch = TrafficSketch()
\ No newline at end of file
@@ -0,0 +1,385 @@
+"""
+OpenAI 사용량 원장
+채팅방/모델/시간 구간별 토큰, 호출 수, 지연 시간 집계
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from loguru import logger
+from typing import Dict, Iterator, List, Optional, Any
+from pathlib import Path
+import asyncio
+import json
+import time
+
+from app.core.config import settings
+
+# 채팅방 정보가 없는 요청 (예: /webhook/summary 직접 호출)
+DIRECT_ROOM = "(direct)"
+
+@dataclass
+class UsageCounter:
+    """사용량 카운터"""
+    calls: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    last_used: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def avg_latency(self) -> float:
+        return self.latency_total / self.calls if self.calls else 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, latency: float, success: bool, now: float):
+        self.calls += 1
+        if not success:
+            self.errors += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.last_used = now
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "avg_latency_ms": round(self.avg_latency * 1000, 2),
+            "max_latency_ms": round(self.latency_max * 1000, 2),
+            "last_used": self.last_used
+        }
+
+@dataclass
+class RoomUsage(UsageCounter):
+    """채팅방 사용량 (예산 기간 누적 포함)"""
+    period_start: float = 0.0
+    period_tokens: int = 0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, latency: float, success: bool, now: float):
+        super().add(prompt_tokens, completion_tokens, latency, success, now)
+        if now - self.period_start >= settings.USAGE_BUDGET_PERIOD_SECONDS:
+            self.period_start = now
+            self.period_tokens = 0
+        self.period_tokens += prompt_tokens + completion_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        data["period_tokens"] = self.period_tokens
+        data["period_start"] = self.period_start
+        return data
+
+class UsageCapture:
+    """작업 하나에서 발생한 사용량 기록 모음 (MQTT 워커가 응답에 실어 프런트엔드 원장에 반영)"""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.closed = False
+
+# 현재 작업의 사용량을 가로챌 수집기 (없으면 원장에 바로 기록)
+_current_capture: ContextVar[Optional[UsageCapture]] = ContextVar("usage_capture", default=None)
+
+# 상위 N 조회에 사용할 수 있는 정렬 기준
+SORT_KEYS = {
+    "total_tokens": lambda c: c.total_tokens,
+    "prompt_tokens": lambda c: c.prompt_tokens,
+    "completion_tokens": lambda c: c.completion_tokens,
+    "calls": lambda c: c.calls,
+    "errors": lambda c: c.errors,
+    "avg_latency": lambda c: c.avg_latency,
+    "latency_total": lambda c: c.latency_total
+}
+
+class UsageLedger:
+    """메모리 내 사용량 원장 (주기적으로 로컬 파일에 기록)"""
+
+    def __init__(self):
+        self.rooms: "OrderedDict[str, RoomUsage]" = OrderedDict()
+        self.models: Dict[str, UsageCounter] = {}
+        self.buckets: "OrderedDict[int, UsageCounter]" = OrderedDict()
+        self.total = UsageCounter()
+        self.started_at = time.time()
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def capture(self) -> Iterator[UsageCapture]:
+        """블록 안에서 발생한 기록을 원장 대신 수집기에 모음
+
+        블록이 끝난 뒤 완료되는 백그라운드 작업(예: 캐시 검증)의 기록은 이 원장에 그대로 남습니다.
+        """
+        capture = UsageCapture()
+        token = _current_capture.set(capture)
+        try:
+            yield capture
+        finally:
+            _current_capture.reset(token)
+            capture.closed = True
+
+    def record_remote(self, records: Any) -> int:
+        """다른 프로세스(MQTT 워커)가 수집해 보낸 기록을 반영하고 반영한 건수를 반환"""
+        if not isinstance(records, list):
+            return 0
+        applied = 0
+        for entry in records:
+            if not isinstance(entry, dict) or not isinstance(entry.get("model"), str):
+                continue
+            room = entry.get("room")
+            try:
+                self.record(
+                    room if isinstance(room, str) else None,
+                    entry["model"],
+                    prompt_tokens=int(entry.get("prompt_tokens") or 0),
+                    completion_tokens=int(entry.get("completion_tokens") or 0),
+                    latency=float(entry.get("latency") or 0.0),
+                    success=bool(entry.get("success", True))
+                )
+            except (TypeError, ValueError):
+                continue
+            applied += 1
+        return applied
+
+    def record(
+        self,
+        room: Optional[str],
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency: float = 0.0,
+        success: bool = True
+    ):
+        """OpenAI 호출 한 건의 사용량을 기록합니다."""
+        capture = _current_capture.get()
+        if capture is not None and not capture.closed:
+            capture.records.append({
+                "room": room,
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency": latency,
+                "success": success
+            })
+            return
+
+        now = time.time()
+        room = room or DIRECT_ROOM
+
+        room_usage = self.rooms.get(room)
+        if room_usage is None:
+            room_usage = RoomUsage(period_start=now)
+            self.rooms[room] = room_usage
+            self._evict_rooms(self.rooms, now)
+        else:
+            self.rooms.move_to_end(room)
+        room_usage.add(prompt_tokens, completion_tokens, latency, success, now)
+
+        self.models.setdefault(model, UsageCounter()).add(
+            prompt_tokens, completion_tokens, latency, success, now
+        )
+
+        bucket_key = int(now // settings.USAGE_BUCKET_SECONDS * settings.USAGE_BUCKET_SECONDS)
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = UsageCounter()
+            self.buckets[bucket_key] = bucket
+            while len(self.buckets) > settings.USAGE_MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+        bucket.add(prompt_tokens, completion_tokens, latency, success, now)
+
+        self.total.add(prompt_tokens, completion_tokens, latency, success, now)
+        self._dirty = True
+
+    @staticmethod
+    def _evict_rooms(rooms: "OrderedDict[str, RoomUsage]", now: float):
+        """채팅방 수 제한 (가장 오래 사용되지 않은 방부터 제거)
+
+        예산을 쓰는 중에는 예산 기간이 끝난 방을 먼저 제거하여 사용량이 초기화되지 않도록 하고,
+        그래도 제거해야 하면 예산이 초기화된다는 경고를 남깁니다.
+        """
+        budget_enabled = settings.USAGE_ROOM_TOKEN_BUDGET > 0
+        period = settings.USAGE_BUDGET_PERIOD_SECONDS
+        while len(rooms) > settings.USAGE_MAX_ROOMS:
+            victim = None
+            if budget_enabled:
+                victim = next(
+                    (room for room, usage in rooms.items() if now - usage.period_start >= period),
+                    None
+                )
+            if victim is None:
+                victim = next(iter(rooms))
+                if budget_enabled and rooms[victim].period_tokens:
+                    logger.warning(
+                        f"채팅방 수 제한(USAGE_MAX_ROOMS={settings.USAGE_MAX_ROOMS})으로 예산 기간 중인 방 제거 - "
+                        f"방: {victim}, 사용 토큰 {rooms[victim].period_tokens} 초기화"
+                    )
+            del rooms[victim]
+
+    def room_usage(self, room: str) -> Optional[Dict[str, Any]]:
+        """특정 채팅방의 사용량"""
+        usage = self.rooms.get(room)
+        if usage is None:
+            return None
+        data = usage.to_dict()
+        data["room"] = room
+        data["budget"] = settings.USAGE_ROOM_TOKEN_BUDGET or None
+        data["over_budget"] = self.is_over_budget(room)
+        return data
+
+    def is_over_budget(self, room: Optional[str]) -> bool:
+        """채팅방이 예산 기간 내 토큰 한도를 초과했는지 확인"""
+        budget = settings.USAGE_ROOM_TOKEN_BUDGET
+        if budget <= 0:
+            return False
+        usage = self.rooms.get(room or DIRECT_ROOM)
+        if usage is None:
+            return False
+        if time.time() - usage.period_start >= settings.USAGE_BUDGET_PERIOD_SECONDS:
+            return False
+        return usage.period_tokens >= budget
+
+    def top_rooms(self, n: int = 10, by: str = "total_tokens") -> List[Dict[str, Any]]:
+        """정렬 기준에 따른 상위 N개 채팅방"""
+        if by not in SORT_KEYS:
+            raise ValueError(f"지원하지 않는 정렬 기준입니다: {by}")
+        key = SORT_KEYS[by]
+        ranked = sorted(self.rooms.items(), key=lambda item: key(item[1]), reverse=True)[:n]
+        return [{"room": room, **usage.to_dict()} for room, usage in ranked]
+
+    def snapshot(self, bucket_limit: int = 24) -> Dict[str, Any]:
+        """원장 전체 요약"""
+        buckets = list(self.buckets.items())[-bucket_limit:]
+        return {
+            "since": self.started_at,
+            "total": self.total.to_dict(),
+            "models": {model: counter.to_dict() for model, counter in self.models.items()},
+            "buckets": [{"start": start, **counter.to_dict()} for start, counter in buckets],
+            "bucket_seconds": settings.USAGE_BUCKET_SECONDS,
+            "room_count": len(self.rooms)
+        }
+
+    def _dump(self) -> Dict[str, Any]:
+        """파일 기록용 전체 데이터"""
+        return {
+            "since": self.started_at,
+            "flushed_at": time.time(),
+            "total": asdict(self.total),
+            "models": {model: asdict(counter) for model, counter in self.models.items()},
+            "buckets": {str(start): asdict(counter) for start, counter in self.buckets.items()},
+            "rooms": {room: asdict(usage) for room, usage in self.rooms.items()}
+        }
+
+    @staticmethod
+    def _merge(counter: UsageCounter, restored: UsageCounter) -> UsageCounter:
+        """재시작 후 새로 쌓인 카운터에 재시작 전 값을 더함"""
+        for name in ("calls", "errors", "prompt_tokens", "completion_tokens", "latency_total"):
+            setattr(counter, name, getattr(counter, name) + getattr(restored, name))
+        counter.latency_max = max(counter.latency_max, restored.latency_max)
+        counter.last_used = max(counter.last_used, restored.last_used)
+        if isinstance(counter, RoomUsage) and time.time() - restored.period_start < settings.USAGE_BUDGET_PERIOD_SECONDS:
+            # 예산 기간이 끝나지 않았으면 재시작 전 사용량도 예산에 포함
+            counter.period_start = min(counter.period_start, restored.period_start)
+            counter.period_tokens += restored.period_tokens
+        return counter
+
+    def restore_state(self, state: Dict[str, Any]):
+        """재시작 전 원장(파일 기록 형식) 복원 (채팅방 예산 기간 누적 포함)"""
+        self.started_at = min(self.started_at, state.get("since", self.started_at))
+        self._merge(self.total, UsageCounter(**state.get("total", {})))
+        for model, data in state.get("models", {}).items():
+            self.models[model] = self._merge(self.models.get(model) or UsageCounter(), UsageCounter(**data))
+
+        buckets = {int(start): UsageCounter(**data) for start, data in state.get("buckets", {}).items()}
+        for start, counter in self.buckets.items():
+            buckets[start] = self._merge(counter, buckets[start]) if start in buckets else counter
+        self.buckets = OrderedDict(sorted(buckets.items())[-settings.USAGE_MAX_BUCKETS:])
+
+        # 재시작 전 채팅방을 앞(오래된 쪽)에 두고 재시작 후 사용한 방을 뒤에 유지
+        rooms: "OrderedDict[str, RoomUsage]" = OrderedDict()
+        for room, data in state.get("rooms", {}).items():
+            rooms[room] = RoomUsage(**data)
+        for room, usage in self.rooms.items():
+            restored = rooms.pop(room, None)
+            rooms[room] = self._merge(usage, restored) if restored is not None else usage
+        self._evict_rooms(rooms, time.time())
+        self.rooms = rooms
+        self._dirty = True
+
+    @staticmethod
+    def _write_file(path: str, data: Dict[str, Any]):
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        tmp.replace(target)
+
+    async def flush(self, force: bool = False) -> bool:
+        """변경된 내용이 있으면 원장을 파일로 기록합니다."""
+        if not (self._dirty or force):
+            return False
+        data = self._dump()
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write_file, settings.USAGE_LEDGER_FILE, data)
+            return True
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"사용량 원장 기록 실패: {e}")
+            return False
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.USAGE_FLUSH_INTERVAL)
+            await self.flush()
+
+    @staticmethod
+    def _read_file(path: str) -> Dict[str, Any]:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def load(self) -> bool:
+        """기록된 원장 파일을 읽어 현재 원장에 합침 (재시작 후에도 채팅방 예산 유지)"""
+        try:
+            state = await asyncio.to_thread(self._read_file, settings.USAGE_LEDGER_FILE)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"사용량 원장 파일을 읽지 못했습니다: {e}")
+            return False
+        try:
+            self.restore_state(state)
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.warning(f"사용량 원장 파일 형식이 올바르지 않습니다: {e}")
+            return False
+        logger.info(f"사용량 원장 복원 - 채팅방 {len(self.rooms)}개, 호출 {self.total.calls:,}회")
+        return True
+
+    async def start(self):
+        """기록된 원장을 불러온 뒤 주기적 기록 작업 시작 (첫 기록이 이전 원장을 덮어쓰지 않도록)"""
+        if self._flush_task is None:
+            await self.load()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """주기적 기록 작업 중지 후 마지막으로 기록"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+# 전역 원장 인스턴스
+usage_ledger = UsageLedger()
\ No newline at end of file
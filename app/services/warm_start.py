@@ -0,0 +1,179 @@
+"""
+웜 스타트 스냅샷
+종료 시 메모리 상태(최근 응답, 요약 캐시, 모델 지연 추정치, 압축 통계, 미확인 WebSocket 응답)를
+압축된 바이너리 파일로 남기고, 다음 시작 때 백그라운드에서 읽어 들여 콜드 스타트 비용을 줄임
+
+파일 형식: 헤더(매직, 형식 버전, 생성 시각, 본문 길이, CRC32) + zlib 압축 JSON 본문
+"""
+
+from loguru import logger
+from pathlib import Path
+from typing import Dict, Optional, Any, Tuple
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+
+from app.core.config import settings
+from app.services.similarity_cache import similarity_cache
+from app.services.dedupe import delivery_deduper
+from app.services.model_router import model_router
+from app.services.prompt_compactor import prompt_compactor
+from app.services.ws_sessions import ws_sessions
+
+SNAPSHOT_MAGIC = b"KBWS"
+# 본문 구조가 바뀌면 올림 (다른 버전의 스냅샷은 읽지 않음)
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("!4sHdII")
+
+class SnapshotError(ValueError):
+    """읽을 수 없는 스냅샷"""
+
+def encode_snapshot(state: Dict[str, Any], created_at: float) -> bytes:
+    body = zlib.compress(
+        json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        6
+    )
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, created_at, len(body), zlib.crc32(body)) + body
+
+def decode_snapshot(data: bytes) -> Tuple[float, Dict[str, Any]]:
+    """스냅샷 바이트 -> (생성 시각, 상태)"""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("헤더가 잘렸습니다")
+    magic, version, created_at, length, checksum = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("스냅샷 파일이 아닙니다")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"형식 버전 불일치 (파일 {version}, 현재 {SNAPSHOT_VERSION})")
+    body = data[_HEADER.size:]
+    if len(body) != length or zlib.crc32(body) != checksum:
+        raise SnapshotError("본문이 손상되었습니다")
+    return created_at, json.loads(zlib.decompress(body))
+
+class WarmStart:
+    """종료 시 상태 저장 / 시작 시 지연 복원
+
+    복원은 서버 시작을 막지 않도록 백그라운드 작업으로 실행되며, 복원 전에 들어온 요청이 쌓은 상태와 합쳐집니다.
+    각 서비스의 캐시 TTL/중복 제거 창은 복원 시에도 그대로 적용되어 만료된 항목은 버려집니다.
+    사용량 원장은 자체 파일(USAGE_LEDGER_FILE)에서 복원하므로 스냅샷에 넣지 않습니다.
+    """
+
+    def __init__(self):
+        self.components = {
+            "similarity_cache": similarity_cache,
+            "dedupe": delivery_deduper,
+            "model_router": model_router,
+            "prompt_compactor": prompt_compactor,
+            "ws_sessions": ws_sessions
+        }
+        self.load_status = "pending"
+        self.loaded_age: Optional[float] = None
+        self.load_time: Optional[float] = None
+        self.restored: Dict[str, str] = {}
+        self.last_save: Optional[Dict[str, Any]] = None
+        self._load_task: Optional[asyncio.Task] = None
+
+    def on_startup(self):
+        if not settings.WARM_START_ENABLED:
+            self.load_status = "disabled"
+            return
+        self._load_task = asyncio.get_running_loop().create_task(self.load())
+
+    async def on_shutdown(self):
+        if not settings.WARM_START_ENABLED:
+            return
+        if self._load_task is not None and not self._load_task.done():
+            # 복원 전 상태로 저장하면 기존 스냅샷을 일부 상태로 덮어쓰므로 저장하지 않음
+            self._load_task.cancel()
+            self.load_status = "cancelled"
+            logger.warning("웜 스타트 복원이 끝나기 전에 종료되어 스냅샷을 저장하지 않습니다.")
+            return
+        await self.save()
+
+    async def load(self):
+        """스냅샷 읽기/검증은 스레드에서, 상태 반영은 루프에서"""
+        path = settings.WARM_START_FILE
+        started = time.perf_counter()
+        try:
+            created_at, state = await asyncio.to_thread(self._read_file, path)
+        except FileNotFoundError:
+            self.load_status = "missing"
+            return
+        except (OSError, SnapshotError, ValueError) as e:
+            self.load_status = "rejected"
+            logger.warning(f"웜 스타트 스냅샷을 사용하지 않습니다: {e}")
+            return
+
+        age = time.time() - created_at
+        self.loaded_age = age
+        if age > settings.WARM_START_MAX_AGE:
+            self.load_status = "expired"
+            logger.info(f"웜 스타트 스냅샷이 오래되어 사용하지 않습니다 ({age:.0f}초 전)")
+            return
+
+        for name, component in self.components.items():
+            if name not in state:
+                continue
+            try:
+                component.restore_state(state[name])
+                self.restored[name] = "ok"
+            except Exception as e:
+                self.restored[name] = f"error: {type(e).__name__}"
+                logger.warning(f"웜 스타트 복원 실패 ({name}): {e}")
+        self.load_status = "loaded"
+        self.load_time = time.perf_counter() - started
+        logger.info(f"♨️ 웜 스타트 스냅샷 복원 - {age:.0f}초 전 상태, {self.load_time * 1000:.1f}ms")
+
+    async def save(self) -> Dict[str, Any]:
+        """현재 상태 저장 (수집은 루프에서, 압축/쓰기는 스레드에서)"""
+        if self._load_task is not None and not self._load_task.done():
+            return {"status": "skipped", "reason": "웜 스타트 복원이 진행 중입니다."}
+        state = {}
+        for name, component in self.components.items():
+            try:
+                state[name] = component.export_state()
+            except Exception as e:
+                logger.warning(f"웜 스타트 상태 수집 실패 ({name}): {e}")
+        created_at = time.time()
+        try:
+            size = await asyncio.to_thread(self._write_file, settings.WARM_START_FILE, state, created_at)
+        except OSError as e:
+            logger.error(f"웜 스타트 스냅샷 저장 실패: {e}")
+            return {"status": "error", "error": str(e)}
+        self.last_save = {"status": "saved", "saved_at": created_at, "bytes": size, "components": sorted(state)}
+        logger.info(f"웜 스타트 스냅샷 저장 - {size:,}바이트")
+        return self.last_save
+
+    @staticmethod
+    def _read_file(path: str) -> Tuple[float, Dict[str, Any]]:
+        with open(path, "rb") as f:
+            return decode_snapshot(f.read())
+
+    @staticmethod
+    def _write_file(path: str, state: Dict[str, Any], created_at: float) -> int:
+        data = encode_snapshot(state, created_at)
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(target.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+        return len(data)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.WARM_START_ENABLED,
+            "file": settings.WARM_START_FILE,
+            "format_version": SNAPSHOT_VERSION,
+            "max_age": settings.WARM_START_MAX_AGE,
+            "load_status": self.load_status,
+            "loaded_age_seconds": round(self.loaded_age, 1) if self.loaded_age is not None else None,
+            "load_time_ms": round(self.load_time * 1000, 2) if self.load_time is not None else None,
+            "restored": self.restored,
+            "last_save": self.last_save
+        }
+
+# 전역 웜 스타트 인스턴스
+warm_start = WarmStart()
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+WebSocket 세션 관리
+메신저 봇 R 클라이언트의 지속 연결용 세션 (응답 순번, 재연결 시 미확인 응답 재전송)
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+import asyncio
+import secrets
+import time
+
+from app.core.config import settings
+
+class WebSocketConnection:
+    """연결 하나의 송신 큐 (단일 송신 작업이 순서대로 전송)"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.closed = False
+
+    async def send(self, frame: Dict[str, Any]):
+        """송신 큐에 추가 (닫힌 연결이면 버림)
+
+        클라이언트가 읽지 않아 WS_HEARTBEAT_TIMEOUT 동안 큐가 비지 않으면 연결을 닫습니다.
+        미확인 응답은 세션에 남아 재연결 시 다시 전송됩니다.
+        """
+        if self.closed:
+            return
+        try:
+            await asyncio.wait_for(self.queue.put(frame), timeout=settings.WS_HEARTBEAT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.close()
+
+    def close(self):
+        """연결 종료 (송신 큐를 비워 대기 중인 전송을 풀어줌, 미확인 응답은 세션에 남음)"""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+class WebSocketSession:
+    """재연결 후에도 유지되는 클라이언트 세션"""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.seq = 0
+        # 순번 -> 아직 클라이언트가 확인(ack)하지 않은 응답
+        self.outbox: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.slots = asyncio.Semaphore(settings.WS_MAX_INFLIGHT)
+        self.inflight = 0
+        self.connection: Optional[WebSocketConnection] = None
+        self.disconnected_at: Optional[float] = None
+        self.created_at = time.time()
+        self.dropped = 0
+
+    async def push(self, frame: Dict[str, Any]):
+        """순번을 붙여 미확인 목록에 보관하고 연결되어 있으면 전송"""
+        self.seq += 1
+        frame = {**frame, "seq": self.seq}
+        self.outbox[self.seq] = frame
+        while len(self.outbox) > settings.WS_MAX_OUTBOX:
+            self.outbox.popitem(last=False)
+            self.dropped += 1
+        if self.connection is not None:
+            await self.connection.send(frame)
+
+    def ack(self, seq: int):
+        """클라이언트가 받은 순번까지 미확인 목록에서 제거"""
+        while self.outbox and next(iter(self.outbox)) <= seq:
+            self.outbox.popitem(last=False)
+
+    def pending_after(self, last_seq: int):
+        return [frame for seq, frame in self.outbox.items() if seq > last_seq]
+
+    def attach(self, connection: WebSocketConnection):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = connection
+        self.disconnected_at = None
+
+    def detach(self, connection: WebSocketConnection):
+        connection.close()
+        if self.connection is connection:
+            self.connection = None
+            self.disconnected_at = time.time()
+
+class WebSocketSessionManager:
+    """세션 저장소 (연결이 끊긴 세션은 WS_RESUME_TTL 후 만료)"""
+
+    def __init__(self):
+        self.sessions: Dict[str, WebSocketSession] = {}
+        self.connections = 0
+        self.resumes = 0
+        self.messages = 0
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            sid for sid, session in self.sessions.items()
+            if session.connection is None
+            and session.inflight == 0
+            and session.disconnected_at is not None
+            and now - session.disconnected_at > settings.WS_RESUME_TTL
+        ]
+        for sid in expired:
+            del self.sessions[sid]
+
+    def open(self, session_id: Optional[str]):
+        """기존 세션 재개 또는 새 세션 생성 (세션, 재개 여부)"""
+        self._expire()
+        self.connections += 1
+        if session_id and session_id in self.sessions:
+            self.resumes += 1
+            return self.sessions[session_id], True
+        session = WebSocketSession(secrets.token_urlsafe(12))
+        self.sessions[session.id] = session
+        return session, False
+
+    def export_state(self) -> Dict[str, Any]:
+        """웜 스타트 스냅샷용 상태 (미확인 응답이 남은 세션)"""
+        self._expire()
+        return {
+            "sessions": [
+                {
+                    "id": session.id,
+                    "seq": session.seq,
+                    "outbox": list(session.outbox.values()),
+                    "created_at": session.created_at,
+                    "dropped": session.dropped
+                }
+                for session in self.sessions.values()
+                if session.outbox
+            ]
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """재연결한 클라이언트가 재시작 전 미확인 응답을 받을 수 있도록 세션 복원"""
+        now = time.time()
+        for data in state.get("sessions", []):
+            if data["id"] in self.sessions:
+                continue
+            session = WebSocketSession(data["id"])
+            session.seq = data["seq"]
+            session.outbox = OrderedDict((frame["seq"], frame) for frame in data["outbox"])
+            session.created_at = data["created_at"]
+            session.dropped = data["dropped"]
+            # 재연결 유예 시간은 재시작 시점부터 계산
+            session.disconnected_at = now
+            self.sessions[session.id] = session
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._expire()
+        return {
+            "sessions": len(self.sessions),
+            "connected": sum(1 for s in self.sessions.values() if s.connection is not None),
+            "inflight": sum(s.inflight for s in self.sessions.values()),
+            "unacked": sum(len(s.outbox) for s in self.sessions.values()),
+            "connections": self.connections,
+            "resumes": self.resumes,
+            "messages": self.messages
+        }
+
+# 전역 세션 관리자
+ws_sessions = WebSocketSessionManager()
\ No newline at end of file
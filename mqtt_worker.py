@@ -0,0 +1,74 @@
+"""
+MQTT 워커 실행 스크립트
+공유 구독으로 작업 토픽을 나눠 받아 OpenAI를 호출하고 결과를 프런트엔드에 돌려줍니다.
+LLM 동시 처리량은 HTTP 서버와 별개로 워커 수/--concurrency로 늘릴 수 있습니다.
+
+사용 예:
+    # 프런트엔드: MQTT_ENABLED=true MQTT_HOST=broker.local python start_server.py
+    MQTT_HOST=broker.local python mqtt_worker.py --concurrency 16
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from pathlib import Path
+
+# 프로젝트 루트를 파이썬 경로에 추가
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+async def main():
+    parser = argparse.ArgumentParser(description="MQTT LLM 워커")
+    parser.add_argument("--worker-id", help="워커 식별자 (기본값: 호스트 이름 기반)")
+    parser.add_argument("--concurrency", type=int, help="동시 처리 작업 수 (기본값: MQTT_WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+
+    from loguru import logger
+    from app.core.config import settings
+    from app.core.logging import setup_logging
+
+    if settings.MQTT_HOST == "local":
+        print("MQTT_HOST=local은 서버 프로세스 내장 워커 전용입니다. 외부 브로커 주소를 지정하세요.")
+        return
+    if args.concurrency:
+        settings.MQTT_WORKER_CONCURRENCY = args.concurrency
+
+    setup_logging()
+
+    from app.services.mqtt_dispatch import MQTTWorker, shared_jobs_topic
+    from app.services.usage_ledger import usage_ledger
+
+    worker = MQTTWorker(args.worker_id)
+    # 작업 사용량은 응답에 실려 프런트엔드 원장에 기록되고, 워커 원장에는 응답 이후 끝난 백그라운드 호출만 남음
+    # 워커마다 별도의 사용량 원장 파일 사용 (여러 프로세스가 같은 파일을 덮어쓰지 않도록)
+    ledger_file = Path(settings.USAGE_LEDGER_FILE)
+    settings.USAGE_LEDGER_FILE = str(ledger_file.with_name(f"{ledger_file.stem}.{worker.client_id}{ledger_file.suffix}"))
+
+    print(f"🛠️ MQTT 워커 시작 - {worker.client_id}")
+    print(f"📡 브로커: {settings.MQTT_HOST}:{settings.MQTT_PORT}, 구독: {shared_jobs_topic()}")
+    print(f"⚙️ 동시 처리: {settings.MQTT_WORKER_CONCURRENCY}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows에서는 KeyboardInterrupt로 종료
+            pass
+
+    await usage_ledger.start()
+    worker.start()
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info(f"MQTT 워커 종료 - {worker.snapshot()}")
+        await worker.stop()
+        await usage_ledger.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
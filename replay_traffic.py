@@ -0,0 +1,205 @@
+"""
+수집한 웹훅 트래픽 재생 도구
+/admin/capture/start로 수집한 파일을 원래 도착 간격(배속 조절 가능)대로 서버에 다시 보내고
+지연 시간 분포와 오류를 보고합니다. OpenAI 호출은 로컬 스텁 서버로 대체됩니다.
+
+사용 예:
+    # 서버를 같은 프로세스에서 띄워 10배속 재생
+    python replay_traffic.py logs/traffic/capture.jsonl.gz --speed 10
+
+    # 이미 실행 중인 서버로 최대 속도 재생 (서버는 OPENAI_BASE_URL=스텁 주소로 실행)
+    python replay_traffic.py capture.jsonl.gz --target http://127.0.0.1:8000 --speed 0 --stub-port 9100
+
+    # 유사 메시지 캐시/중복 제거 없이 매 요청 OpenAI(스텁) 경로 측정
+    python replay_traffic.py capture.jsonl.gz --no-caches
+
+가명 처리된 수집 파일의 메시지는 단어 단위 가명이라 서로 다른 메시지는 캐시에서 구분되고 실제 반복만 캐시에 적중합니다.
+캐시 효과를 빼고 업스트림 경로만 보려면 --no-caches를 사용하세요 (--target 서버는 서버 설정을 따름).
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# 프로젝트 루트를 파이썬 경로에 추가
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.core.stats import percentile
+
+def create_stub_app(latency_ms: float, jitter_ms: float, error_rate: float):
+    """OpenAI Chat Completions 호환 스텁 서버"""
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if random.random() < error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "stub overloaded", "type": "server_error"}})
+
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+        max_tokens = body.get("max_tokens") or 100
+        completion_tokens = min(max_tokens, 60)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "스텁 요약 1\n스텁 요약 2\n스텁 요약 3"},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_chars + completion_tokens
+            }
+        }
+
+    return stub
+
+def start_stub_server(port: int, latency_ms: float, jitter_ms: float, error_rate: float) -> str:
+    """스텁 서버를 백그라운드 스레드에서 실행하고 base_url 반환"""
+    import uvicorn
+
+    config = uvicorn.Config(
+        create_stub_app(latency_ms, jitter_ms, error_rate),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="openai-stub", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+def print_report(results, wall_time: float):
+    """지연 시간 분포 및 오류 보고"""
+    by_path = defaultdict(list)
+    for result in results:
+        by_path[result["path"]].append(result)
+    by_path["(전체)"] = results
+
+    print("=" * 72)
+    print(f"재생 완료: 요청 {len(results)}개, {wall_time:.2f}초, {len(results) / wall_time if wall_time else 0:.1f} req/s")
+    print(f"{'경로':<20}{'요청':>7}{'오류':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for path, items in by_path.items():
+        latencies = sorted(r["latency"] * 1000 for r in items)
+        errors = sum(1 for r in items if r["error"])
+        print(
+            f"{path:<20}{len(items):>7}{errors:>7}"
+            f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 90):>9.1f}"
+            f"{percentile(latencies, 99):>9.1f}{max(latencies, default=0):>9.1f}"
+        )
+
+    lags = sorted(r["lag"] * 1000 for r in results)
+    print(f"전송 지연(스케줄 대비): p50 {percentile(lags, 50):.1f}ms, p99 {percentile(lags, 99):.1f}ms")
+    error_kinds = defaultdict(int)
+    for result in results:
+        if result["error"]:
+            error_kinds[result["error"]] += 1
+    for kind, count in sorted(error_kinds.items(), key=lambda item: -item[1])[:10]:
+        print(f"  오류 {count:>5}회: {kind}")
+    print("=" * 72)
+
+async def replay(records, client, speed: float, concurrency: int):
+    """도착 간격을 speed 배속으로 재현하여 전송 (speed <= 0이면 최대 속도)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    origin = records[0]["t"] if records else 0.0
+    started = time.perf_counter()
+
+    async def send(record):
+        scheduled = (record["t"] - origin) / speed if speed > 0 else 0.0
+        delay = scheduled - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            sent = time.perf_counter()
+            error = None
+            try:
+                response = await client.post(record["p"], json=record["b"])
+                if response.status_code >= 400:
+                    error = f"HTTP {response.status_code}"
+                elif record["p"] == "/webhook/message" and not response.json().get("success", True):
+                    error = "success=false"
+            except Exception as e:
+                error = type(e).__name__
+            results.append({
+                "path": record["p"],
+                "latency": time.perf_counter() - sent,
+                "lag": max(0.0, sent - started - scheduled),
+                "error": error
+            })
+
+    await asyncio.gather(*(send(record) for record in records))
+    return results, time.perf_counter() - started
+
+async def main():
+    parser = argparse.ArgumentParser(description="웹훅 트래픽 재생 도구")
+    parser.add_argument("capture", help="수집 파일 경로 (.jsonl 또는 .jsonl.gz)")
+    parser.add_argument("--target", help="대상 서버 URL (생략하면 같은 프로세스에서 앱 실행)")
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (1, 10, ... / 0이면 최대 속도)")
+    parser.add_argument("--concurrency", type=int, default=256, help="동시 요청 수 상한")
+    parser.add_argument("--limit", type=int, default=0, help="재생할 최대 요청 수")
+    parser.add_argument("--stub-port", type=int, default=9100, help="OpenAI 스텁 서버 포트")
+    parser.add_argument("--stub-latency-ms", type=float, default=800.0, help="스텁 응답 지연 (ms)")
+    parser.add_argument("--stub-jitter-ms", type=float, default=300.0, help="스텁 응답 지연 편차 (ms)")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="스텁 503 오류 비율")
+    parser.add_argument("--no-caches", action="store_true", help="유사 메시지 캐시와 중복 제거 끄기 (같은 프로세스 재생)")
+    args = parser.parse_args()
+
+    from app.services.traffic_capture import load_capture
+
+    records = load_capture(args.capture)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("재생할 요청이 없습니다.")
+        return
+    span = records[-1]["t"] - records[0]["t"]
+    print(f"📼 요청 {len(records)}개 (원래 {span:.1f}초 구간), 배속: {'최대' if args.speed <= 0 else f'{args.speed}x'}")
+
+    stub_url = start_stub_server(args.stub_port, args.stub_latency_ms, args.stub_jitter_ms, args.stub_error_rate)
+    print(f"🧪 OpenAI 스텁 서버: {stub_url}")
+
+    import httpx
+
+    if args.target:
+        print(f"🎯 대상 서버: {args.target} (서버를 OPENAI_BASE_URL={stub_url} 로 실행해야 합니다)")
+        client = httpx.AsyncClient(base_url=args.target, timeout=120)
+    else:
+        from app.core.config import settings
+        from app.services.openai_service import openai_service
+        from app.services.traffic_capture import traffic_capture
+        from app.main import app
+
+        settings.OPENAI_BASE_URL = stub_url
+        settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "stub-key"
+        openai_service._initialize_client()
+        # 재생 트래픽이 다시 수집되지 않도록
+        traffic_capture.enabled = False
+        if args.no_caches:
+            settings.SIMILARITY_CACHE_ENABLED = False
+            settings.DEDUPE_ENABLED = False
+
+        print(f"🎯 대상 서버: 같은 프로세스 (ASGI){', 캐시/중복 제거 끔' if args.no_caches else ''}")
+        client = httpx.AsyncClient(app=app, base_url="http://replay", timeout=120)
+
+    async with client:
+        results, wall_time = await replay(records, client, args.speed, args.concurrency)
+    print_report(results, wall_time)
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
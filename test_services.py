@@ -0,0 +1,178 @@
+"""
+스트리밍 스케치, 서킷 브레이커, 중복 제거, 키 풀 동작 테스트
+"""
+
+import sys
+from collections import Counter
+from pathlib import Path
+import asyncio
+import random
+import time
+
+# 프로젝트 루트를 파이썬 경로에 추가
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.core.config import settings
+from app.services.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from app.services.dedupe import DeliveryDeduper
+from app.services.key_pool import APIKeyPool, NoUsableKeyError
+from app.services.traffic_sketch import CountMinSketch, HyperLogLog, SpaceSaving, TrafficSketch, _hash
+
+def _zipf_stream(keys: int, length: int, seed: int = 7):
+    """상위 키에 빈도가 몰린 스트림"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(keys)]
+    return rng.choices([f"key-{rank}" for rank in range(keys)], weights=weights, k=length)
+
+def test_space_saving_top_k():
+    """Space-Saving: 보고 횟수는 실제 이상, 보장 횟수는 실제 이하, 빈도 > N/K인 키는 모두 추적"""
+    stream = _zipf_stream(keys=500, length=20000)
+    exact = Counter(stream)
+    capacity = 50
+    top = SpaceSaving(capacity)
+    for key in stream:
+        top.add(key)
+
+    assert len(top.counters) == capacity
+    for key, count, error, _ in top.items():
+        guaranteed = count - error
+        assert 0 <= guaranteed <= count
+        assert guaranteed <= exact[key] <= count
+    # 추적되지 않은 키의 실제 횟수는 min_count 이하
+    for key, true_count in exact.items():
+        if key not in top.counters:
+            assert true_count <= top.min_count
+    # N/K보다 자주 나온 키는 반드시 추적되고, 보장 횟수 기준 상위 10개가 실제 상위 10개와 일치
+    for key, true_count in exact.items():
+        if true_count > len(stream) / capacity:
+            assert key in top.counters
+    ranked = sorted(top.items(), key=lambda item: item[1] - item[2], reverse=True)[:10]
+    assert [key for key, *_ in ranked] == [key for key, _ in exact.most_common(10)]
+
+def test_traffic_sketch_top_guaranteed():
+    """슬롯을 합친 상위 목록도 guaranteed <= count, 실제 횟수는 그 사이"""
+    sketch = TrafficSketch()
+    stream = _zipf_stream(keys=300, length=5000, seed=11)
+    for room in stream:
+        sketch.record(room, "sender", "메시지")
+    exact = Counter(stream)
+    for item in sketch.top("rooms", sketch.max_window, 20):
+        assert item["guaranteed"] <= exact[item["room"]] <= item["count"]
+
+def test_count_min_sketch_upper_bound():
+    """Count-Min Sketch 추정치는 실제 빈도 이상"""
+    stream = _zipf_stream(keys=2000, length=20000, seed=3)
+    cms = CountMinSketch(width=1024, depth=4)
+    for key in stream:
+        cms.add(_hash(key))
+    for key, true_count in Counter(stream).items():
+        assert cms.estimate(_hash(key)) >= true_count
+
+def test_hyperloglog_error():
+    """HyperLogLog 추정치가 표준 오차(1.04 / sqrt(m))의 3배 안에 있음"""
+    precision = 12
+    m = 1 << precision
+    tolerance = 3 * 1.04 / m ** 0.5
+    for distinct in (100, 5000, 100000):
+        hll = HyperLogLog(precision)
+        for i in range(distinct):
+            hll.add(_hash(f"user-{i}"))
+        # 중복 추가는 추정치에 영향 없음
+        for i in range(0, distinct, 10):
+            hll.add(_hash(f"user-{i}"))
+        estimate = HyperLogLog.count_registers(bytes(hll.registers))
+        assert abs(estimate - distinct) <= tolerance * distinct
+
+    # 합집합은 레지스터별 최대값
+    left, right = HyperLogLog(precision), HyperLogLog(precision)
+    for i in range(20000):
+        (left if i % 2 else right).add(_hash(f"user-{i}"))
+    merged = HyperLogLog.count_registers(HyperLogLog.union([bytes(left.registers), bytes(right.registers)]))
+    assert abs(merged - 20000) <= tolerance * 20000
+
+def test_circuit_breaker_transitions():
+    """closed -> open -> half_open -> closed, half_open에서 실패하면 다시 open"""
+    breaker = CircuitBreaker("test")
+    assert breaker.state == CLOSED
+    for _ in range(settings.OPENAI_BREAKER_MIN_CALLS):
+        assert breaker.allow_request()
+        breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    # 열림 시간이 지나면 시험 호출만 허용
+    breaker.opened_at -= settings.OPENAI_BREAKER_OPEN_SECONDS
+    for _ in range(settings.OPENAI_BREAKER_HALF_OPEN_PROBES):
+        assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+    # 시험 호출 하나라도 실패하면 다시 open
+    breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+
+    breaker.opened_at -= settings.OPENAI_BREAKER_OPEN_SECONDS
+    for _ in range(settings.OPENAI_BREAKER_HALF_OPEN_PROBES):
+        assert breaker.allow_request()
+        breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.open_count == 2
+    assert breaker.allow_request()
+
+def test_dedupe_does_not_replay_failures():
+    """keep이 거짓인 응답과 예외는 저장하지 않아 재전송 시 다시 처리되고, 정상 응답은 재사용"""
+    async def scenario():
+        deduper = DeliveryDeduper()
+        calls = []
+
+        def handler(result):
+            async def run():
+                calls.append(result)
+                if isinstance(result, Exception):
+                    raise result
+                return result
+            return run
+
+        def keep(result):
+            return result != "failed"
+
+        def ack():
+            return "ack"
+
+        fp = b"fingerprint"
+        assert await deduper.run(fp, handler("failed"), ack, keep) == "failed"
+        # 재전송: 실패 응답을 되돌려주지 않고 다시 처리
+        assert await deduper.run(fp, handler("ok"), ack, keep) == "ok"
+        assert await deduper.run(fp, handler("unused"), ack, keep) == "ok"
+        assert calls == ["failed", "ok"]
+
+        other = b"other"
+        try:
+            await deduper.run(other, handler(RuntimeError("boom")), ack, keep)
+        except RuntimeError:
+            pass
+        assert await deduper.run(other, handler("retried"), ack, keep) == "retried"
+        assert deduper.reply_hits == 1
+
+    asyncio.run(scenario())
+
+def test_key_pool_fails_fast_without_usable_keys():
+    """모든 키가 인증 실패로 제외되면 OPENAI_KEY_MAX_WAIT까지 기다리지 않고 즉시 실패"""
+    async def scenario():
+        pool = APIKeyPool()
+        pool.configure(["sk-test-key-0001"])
+        key = await pool.acquire(10)
+        pool.release(key, 10)
+        key.disabled_until = time.monotonic() + 60
+
+        started = time.monotonic()
+        try:
+            await pool.acquire(10)
+            assert False, "NoUsableKeyError가 발생해야 함"
+        except NoUsableKeyError:
+            pass
+        assert time.monotonic() - started < 0.5
+        assert pool.snapshot()["rejected_no_usable_key"] == 1
+
+    asyncio.run(scenario())
\ No newline at end of file